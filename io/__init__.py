@@ -1,32 +1,154 @@
 import inspect
 import sys
+import gzip
+import socket
+import hashlib
 import asyncio
+import multiprocessing
 import typing as t
 
-from functools import wraps
-from threading import Event
+from functools import wraps, cache
+from html.parser import HTMLParser
+from threading import Event, active_count
+from concurrent.futures import Executor
 
 from starlette.requests import Request
 from starlette.applications import Starlette
-from starlette.websockets import WebSocket, WebSocketState
-from starlette.responses import PlainTextResponse, Response
+from starlette.websockets import WebSocket, WebSocketState, WebSocketDisconnect
+from starlette.responses import Response, StreamingResponse
 
 from .pybridge import (
-  AsyncMultiServer, BridgeJS, daemon_task,
-  force_sync, async_daemon_task, run_sync,
-  generate_random_id, INJECTED_SCRIPT_SRC
+  AsyncMultiServer, bridge_js, injected_script_src, daemon_task,
+  force_sync, run_sync, generate_random_id,
+  CONNECT_SCRIPT_SRC, PORTAL
 )
 
-from .utils import Hooks
+from .utils import Hooks, LRUCache
+from .state import StateBackend, MemoryState
+from .executors import stats as pool_stats
+from .tracing import traced
 
-from .dom.helpers import generate_xpath
-from .dom import HTML as DOMHTML, MutationObserver, core
-from .ui import HTML, Element, diff, build_client_callback, configure
+from .ui import (
+  HTML, Element, Reactive, Template, UpdateScheduler, diff, keyed_diff,
+  element_path, patchAttributes, build_client_callback, configure,
+  render_attribute, SINGLE_TAGS
+)
 
 if t.TYPE_CHECKING:
+  from .dom import core
+
   ResponseData = t.TypeVar("ResponseData")
 
 
+@cache
+def bridge_js_encodings():
+  """The bridge's build in every encoding served, compressed once"""
+  body = bridge_js()[1].encode()
+  encodings = {"gzip": gzip.compress(body, 9), "identity": body}
+
+  try:
+    import brotli
+  except ImportError:
+    pass
+  else:
+    encodings = {"br": brotli.compress(body), **encodings}
+
+  return encodings
+
+
+def accepted_encodings(header):
+  """Codings an Accept-Encoding header allows, whatever their weight"""
+  accepted = set()
+  for coding in header.split(","):
+    coding, *params = coding.split(";")
+    weight = 1.0
+    for param in params:
+      name, _, value = param.strip().partition("=")
+      if name == "q":
+        try:
+          weight = float(value)
+        except ValueError:
+          weight = 0
+    if weight > 0:
+      accepted.add(coding.strip().lower())
+  return accepted
+
+
+def is_dom(value):
+  """
+  Whether `value` is a document or node of the package's own DOM. Nothing
+  is before `dom.core` was imported, so it isn't imported to find out.
+  """
+  core = sys.modules.get(f"{__name__}.dom.core")
+  if core is None:
+    return False
+  dom = sys.modules[f"{__name__}.dom"]
+  return isinstance(value, (dom.HTML, core.Document, core.Element))
+
+
+def inject_scripts(page, scripts):
+  """`page` with `scripts` added at the end of the document"""
+  start, end, rest = page.rpartition("</html>")
+  if not end:
+    return scripts + page
+  return start + scripts + end + rest
+
+
+def static_page(page):
+  """
+  `page` as the cache serves it: the same for every load, as it gets its
+  connection from an uncached script instead of an inline one.
+  """
+  return inject_scripts(
+    page,
+    f'<script src="{injected_script_src()}"></script>' +
+    f'<script src="{CONNECT_SCRIPT_SRC}"></script>'
+  )
+
+
+def etag_matches(request, etag):
+  """Whether the request's If-None-Match has `etag`, weakly compared"""
+  header = request.headers.get("if-none-match")
+  if not header:
+    return False
+
+  tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+  return etag.removeprefix("W/") in tags or "*" in tags
+
+
+class ElementCounter(HTMLParser):
+  """Counts the elements at the top level of a markup fragment"""
+
+  def __init__(self):
+    super().__init__()
+    self.depth = 0
+    self.count = 0
+
+  def handle_starttag(self, tag, attrs):
+    if self.depth == 0:
+      self.count += 1
+    if tag not in SINGLE_TAGS:
+      self.depth += 1
+
+  def handle_startendtag(self, tag, attrs):
+    if self.depth == 0:
+      self.count += 1
+
+  def handle_endtag(self, tag):
+    self.depth = max(self.depth - 1, 0)
+
+
+def top_level_elements(data):
+  """How many elements `data` adds where it is written into a page"""
+  if isinstance(data, Element):
+    return 1
+
+  counter = ElementCounter()
+  counter.feed(str(data))
+  counter.close()
+  return counter.count
+
+
 class WebSocketWrapper:
 
   def __init__(self, socket):
@@ -46,19 +168,88 @@ class WebSocketWrapper:
     return self.socket.client_state == WebSocketState.DISCONNECTED
 
 
+class RelayedSocket:
+  """
+  The owner's end of a WebSocket that reached another process, frames go
+  through the state backend's relay.
+  """
+
+  def __init__(self, state, origin, conn_id, loop):
+    self.state = state
+    self.origin = origin
+    self.conn_id = conn_id
+
+    self.__frames = asyncio.Queue()
+    self.__loop = loop
+    self.__closed = False
+
+  def feed(self, frame):
+    """Called from the relay's thread, None once the socket closed"""
+    self.__loop.call_soon_threadsafe(self.__frames.put_nowait, frame)
+
+  async def receive(self):
+    frame = await self.__frames.get()
+    if frame is None:
+      self.__closed = True
+      raise WebSocketDisconnect()
+    return frame
+
+  async def send(self, data):
+    self.state.relay(self.origin, ("send", self.conn_id, data))
+
+  async def close(self):
+    self.__closed = True
+    self.state.relay(self.origin, ("close", self.conn_id))
+
+  @property
+  def closed(self):
+    return self.__closed
+
+
 class BridgeResponse(Response, Hooks):
   RESPONSE_NOT_SENT = 0
   RESPONSE_SENT = 1
 
   media_type = "text/html"
 
-  def __init__(self, *args, server=None, simple=False, **kwargs):
+  def __init__(
+    self, *args, server=None, simple=False, update_interval=1 / 60,
+    template=None, state: StateBackend = None, stream=False,
+    cacheable=False, **kwargs
+  ):
     self.status = self.RESPONSE_NOT_SENT
 
+    # set to the page without its bootstrap scripts when it can be cached
+    self.cacheable = cacheable
+    self.page = None
+
+    # streamed pages send their head before the route renders the body
+    self.stream = stream
+    self.__opened = False
+    # elements written ahead of the sent one, and where they offset paths
+    self.__written = 0
+    self.__shift = None
+
     self.__browser = None
     self.__server = server
     self.__simple = simple
     self.__queue = asyncio.Queue()
+    self.__document = None
+
+    # the loop waiting on `get`, sends may come from another thread
+    try:
+      self.__loop = asyncio.get_running_loop()
+    except RuntimeError:
+      self.__loop = None
+
+    # the compiled template of the sent element, reusable by the route
+    self.template = template
+
+    # callbacks go to the namespace the server resolves this connection in
+    self.state = state or MemoryState(server.namespaces if server else None)
+    # callback -> name, the reverse of this connection's namespace
+    self.__names = {}
+    self.scheduler = UpdateScheduler(self.__update, update_interval)
 
     if not self.__simple:
       self.__conn_id, self.__script = self.__server.new_connection()
@@ -69,22 +260,39 @@ class BridgeResponse(Response, Hooks):
   @property
   def id(self):
     return self.__conn_id
+
+  @property
+  def bootstrap(self):
+    """The script connecting the page to this response"""
+    return self.__script
   
   @property
   def __context__(self) -> dict:
-    return self.__server.exec_context
+    return self.state.namespace(self.__conn_id)
 
   def register(self, name, func):
-    self.__context__[name] = func
+    # a re-render replaces the function registered under `name`
+    previous = self.state.lookup(self.__conn_id, name)
+    self.state.register(self.__conn_id, name, func)
+    try:
+      if previous is not func and self.__names.get(previous) == name:
+        del self.__names[previous]
+    except TypeError:
+      pass
+
+    try:
+      self.__names[func] = name
+    except TypeError:
+      pass
 
   def get_key(self, item):
-    for key, value in self.__context__.items():
-      if value == item:
-        return key
-    return None
+    try:
+      return self.__names.get(item)
+    except TypeError:
+      return None
   
   def get_value(self, key):
-    return self.__context__.get(key)
+    return self.state.lookup(self.__conn_id, key)
   
   def __ensure_body(self, element, html):
     if element.name != "html":
@@ -96,6 +304,154 @@ class BridgeResponse(Response, Hooks):
         element = html.html(element)
     return element
   
+  def __put(self, data):
+    try:
+      loop = asyncio.get_running_loop()
+    except RuntimeError:
+      loop = None
+
+    if self.__loop is None or loop is self.__loop:
+      self.__queue.put_nowait(data)
+    else:
+      self.__loop.call_soon_threadsafe(self.__queue.put_nowait, data)
+
+  def __scripts(self):
+    if self.__simple:
+      return ""
+    return (
+      f'<script src="{injected_script_src()}"></script>' +
+      f'<script>{self.__script}</script>'
+    )
+
+  def inject(self, page):
+    """`page` with this connection's bootstrap scripts"""
+    return inject_scripts(page, self.__scripts())
+
+  def prelude(self):
+    """
+    The start of a streamed page, sent as soon as the route starts so the
+    browser fetches the bridge and connects while the body is rendered.
+    The attributes of the page's <html> and <body>, known later, are sent
+    as start tags of their own, which browsers merge into the open ones.
+    """
+    return "<!DOCTYPE html>\n<html>\n<head>\n" + self.__scripts() + "\n"
+
+  def __open_body(self):
+    if not self.__opened:
+      self.__opened = True
+      self.__put("</head>\n<body>\n")
+
+  async def write(self, data):
+    """
+    Streams `data` (markup, an element or a document) into the body of a
+    streamed page; the page ends with `send`. Written elements are sent as
+    they are, only the element given to `send` is kept up to date.
+    """
+    if not self.stream:
+      raise TypeError("Only streamed responses can be written to.")
+    if self.status == self.RESPONSE_SENT:
+      raise TypeError("The response was already sent.")
+
+    self.__open_body()
+    self.__written += top_level_elements(data)
+    self.__put(str(data))
+
+  def __head(self, html, root):
+    """
+    `root`'s head, with the prelude's scripts so paths into it match the
+    browser's, and the number of those scripts.
+    """
+    head = next((
+      child for child in root.children
+      if isinstance(child, Element) and child.name == "head"
+    ), None)
+
+    if head is None:
+      head = html.head()
+      root.prepend(head)
+
+    scripts = []
+    if not self.__simple:
+      scripts = [
+        html.script(src=injected_script_src()),
+        html.script(Reactive(self.__script))
+      ]
+      head.prepend(*scripts)
+
+    return head, len(scripts)
+
+  def __start_tag(self, element):
+    """`element`'s start tag, if it has attributes to add to an open one"""
+    attributes = "".join(
+      render_attribute(element, attr, value)
+      for attr, value in element.attributes.items()
+    )
+    return f"<{element.name}{attributes}>\n" if attributes else ""
+
+  def __stream(self, html, root):
+    """Sends what `root` has to add to the prelude, then ends the page"""
+    head, scripts = self.__head(html, root)
+    self.__put(self.__start_tag(root))
+
+    for child in head.children[scripts:]:
+      self.__put(self.__part(child, 2))
+
+    self.__opened = True
+    self.__put("</head>\n")
+
+    for child in root.children:
+      if child is head:
+        continue
+      self.__put(self.__part(child, 1))
+
+    self.__put("</html>")
+
+  def __stream_tail(self, html, root):
+    """
+    Ends a page whose body was written to with the body of `root`: its
+    children, as the head was sent with the prelude and the body is open.
+    """
+    head, _ = self.__head(html, root)
+
+    body = next((
+      child for child in root.children
+      if isinstance(child, Element) and child.name == "body"
+    ), None)
+    if body is None:
+      # what a browser would move into the body anyway
+      body = html.body()
+      body.append(*[
+        child for child in list(root.children) if child is not head
+      ])
+      root.append(body)
+
+    self.__put(self.__start_tag(root) + self.__start_tag(body))
+    for child in body.children:
+      self.__put(self.__part(child, 2))
+    self.__put("</body>\n</html>")
+
+    # the written elements come first in the browser's body
+    self.__shift = (body, element_path(body, root)[0], self.__written)
+
+  def __part(self, child, depth):
+    if isinstance(child, Element):
+      return child.__compile__(depth=depth)
+    return str(child)
+
+  def __end_stream(self, data):
+    self.__open_body()
+    self.__put(str(data))
+    self.__put("</body>\n</html>")
+
+  def __render(self, element):
+    # the route's template is reused while the same slots hold the same
+    # kinds of values, anything else is rendered in full
+    if self.template and self.template.matches(element):
+      return self.template.render(element)
+
+    self.template = Template.reusable(element)
+    return self.template.render(element)
+
   def __generate_callback(self, event, element, callbacks):
     def wrapper(_event, this):
       for callback in [
@@ -113,7 +469,9 @@ class BridgeResponse(Response, Hooks):
       args=["event", "this"], response=self
     )(wrapper)
   
-  def __setup_document(self, document: core.Document):
+  def __setup_document(self, document: "core.Document"):
+    from .dom import MutationObserver, core
+
     for element in core.GLOBAL_LISTENERS:
       listeners= core.GLOBAL_LISTENERS[element]
       for eventType in listeners:
@@ -140,7 +498,7 @@ class BridgeResponse(Response, Hooks):
     
     return document
 
-  async def __clone_element(self, node: core.Element, browser):
+  async def __clone_element(self, node: "core.Element", browser):
     tag = await browser.document.createElement(node.tagName)
 
     for (attr, value) in node.attributes.items():
@@ -153,21 +511,81 @@ class BridgeResponse(Response, Hooks):
         await self.__clone_element(child, browser)
       )
 
+  def __keyed_children(self, node: "core.Element"):
+    from .dom import core
+
+    keys = []
+    for child in node.childNodes:
+      if not isinstance(child, core.Element) or child.key is None:
+        return None
+      keys.append(str(child.key))
+
+    if not keys or len(set(keys)) != len(keys):
+      return None
+    return keys
+
+  async def __reconcile_keyed(self, browser, vdom_target, dom_target, keys):
+    found = await browser.JSBridge.childKeys(dom_target) or []
+    current = [key for key in found if key is not None]
+    children = dict(zip(keys, vdom_target.childNodes))
+
+    operations = keyed_diff(current, keys)
+    for operation in operations:
+      if operation[0] == "insert":
+        operation.append(str(children[operation[1]]))
+
+    if operations or len(found) != len(current):
+      await browser.JSBridge.reconcileKeyed(dom_target, operations)
+
   @run_sync
-  async def __make_mutations(self, mutations: list[core.MutationRecord]):
+  async def __make_mutations(self, mutations: "list[core.MutationRecord]"):
+    from .dom.helpers import generate_xpath
+
     try:
       browser = await self.get_browser()
     except Exception:
       return
 
+    # records are deduplicated before any of their targets is looked up in
+    # the browser: keyed child lists are reconciled once per target, and
+    # the other changes are read from the final state, so one is enough
+    keyed, seen, records = {}, set(), []
     for mutation in mutations:
+      target = mutation.target
+      if mutation.type == "childList":
+        if id(target) not in keyed:
+          keyed[id(target)] = self.__keyed_children(target)
+        elif keyed[id(target)] is not None:
+          continue
+      else:
+        change = (id(target), mutation.type, mutation.attributeName)
+        if change in seen:
+          continue
+        seen.add(change)
+      records.append(mutation)
+
+    # reconciled lists first, so the paths of their children, taken from
+    # the final tree, find the same nodes in the browser
+    records.sort(key=lambda mutation: not (
+      mutation.type == "childList" and keyed[id(mutation.target)] is not None
+    ))
+
+    # target -> its node in the browser, looked up once per batch
+    nodes = {}
+
+    for mutation in records:
       vdom_target = mutation.target
-      xpath = generate_xpath(vdom_target)
-      dom_target = await browser.JSBridge.evalXpath(xpath)
+      if id(vdom_target) not in nodes:
+        xpath = generate_xpath(vdom_target)
+        found = await browser.JSBridge.evalXpath(xpath)
+        if await browser.Boolean(found):
+          found = await found.singleNodeValue
+        else:
+          found = None
+        nodes[id(vdom_target)] = found
 
-      if await browser.Boolean(dom_target):
-        dom_target = await dom_target.singleNodeValue
-      else:
+      dom_target = nodes[id(vdom_target)]
+      if dom_target is None:
         continue
 
       if mutation.type == "attributes":
@@ -182,6 +600,11 @@ class BridgeResponse(Response, Hooks):
           name, getattr(vdom_target.style, name)
         )
       elif mutation.type == "childList":
+        keys = keyed[id(vdom_target)]
+        if keys is not None:
+          await self.__reconcile_keyed(browser, vdom_target, dom_target, keys)
+          continue
+
         for node in mutation.addedNodes:
           await dom_target.appendChild(
             await self.__clone_element(node, browser)
@@ -201,6 +624,54 @@ class BridgeResponse(Response, Hooks):
             )
           )
 
+  async def __update(self, targets):
+    html, root = self.__document
+
+    if html in targets:
+      targets = [root]
+
+    if self.__shift:
+      body, _, _ = self.__shift
+      # the written elements aren't in the tree, so the body is updated
+      # through its children rather than as a whole
+      targets = [
+        child for target in targets
+        for child in (
+          [item for item in body.children if isinstance(item, Element)]
+          if target is root or target is body else [target]
+        )
+      ]
+
+    # a dirty ancestor re-renders its whole subtree anyway
+    dirty = set(targets)
+    for element in targets:
+      parent = element.parent
+      while parent is not None and parent not in dirty:
+        parent = parent.parent
+
+      if parent is not None:
+        dirty.discard(element)
+
+    browser = await self.get_browser()
+
+    for element in targets:
+      if element not in dirty:
+        continue
+
+      path = element_path(element, root)
+      if path is None:
+        continue
+
+      if self.__shift and len(path) > 1 and path[0] == self.__shift[1]:
+        path[1] += self.__shift[2]
+
+      dom = await browser.JSBridge.nodeAtPath(path)
+      await browser.JSBridge.cleanDom(dom)
+
+      if element is not root:
+        await patchAttributes(element, dom, browser, html)
+      await diff(browser, html, element, dom)
+
   async def send(self, data: "ResponseData") -> "ResponseData":
     if self.status == self.RESPONSE_NOT_SENT:
       self.status = self.RESPONSE_SENT
@@ -217,25 +688,37 @@ class BridgeResponse(Response, Hooks):
           response = html.__main__
 
         response = self.__ensure_body(response, html)
+        self.__document = (html, response)
 
         @html.on("update")
-        async def _():
-          browser = await self.get_browser()
-          await browser.JSBridge.cleanDom()
+        def _(element=None):
+          self.scheduler.schedule(element or html)
 
-          await diff(
-            browser, html, response,
-            await browser.document.children[0]
-          )
+        if self.stream:
+          if self.__opened:
+            # the body is already streaming, this is its last part
+            self.__stream_tail(html, response)
+          else:
+            self.__stream(html, response)
+          return self.__put(None)
+
+        if self.cacheable:
+          template = response.__template__()
+          if not template.slots:
+            self.page = template.render(response)
+            return self.__put(self.inject(self.page))
 
         if not self.__simple:
-          script1 = html.script(src=INJECTED_SCRIPT_SRC)
-          script2 = html.script(self.__script)
+          script1 = html.script(src=injected_script_src())
+          # a slot, so cached templates don't bake in the connection id
+          script2 = html.script(Reactive(self.__script))
   
           response.append(script1, script2)
 
-        return await self.__queue.put(response.__compile__())
-      elif isinstance(response, (DOMHTML, core.Document, core.Element)):
+        return self.__put(self.__render(response))
+      elif is_dom(response):
+        from .dom import core
+
         document = response.ownerDocument
         if not document:
           document = core.Document()
@@ -250,13 +733,16 @@ class BridgeResponse(Response, Hooks):
         document = self.__setup_document(document)
         response = str(document)
 
-      if self.__simple:
-        await self.__queue.put(str(response))
+      if self.stream:
+        self.__end_stream(response)
+        self.__put(None)
+      elif self.__simple:
+        self.__put(str(response))
       else:
-        await self.__queue.put(
-          f'<script src="{INJECTED_SCRIPT_SRC}"></script>' +
-          f'<script>{self.__script}</script>' + str(response)
-        )
+        # pages that registered no callbacks look the same to everyone
+        if self.cacheable and not self.__context__:
+          self.page = str(response)
+        self.__put(self.inject(str(response)))
     else:
       browser = await self.get_browser()
       await browser.document.writeLn(str(response))
@@ -275,65 +761,401 @@ class BridgeResponse(Response, Hooks):
   def get(self):
     return self.__queue.get()
 
+  def get_nowait(self):
+    return self.__queue.get_nowait()
+
 
 class BridgeIO(Starlette):
 
-  def __init__(self, *args, **kwargs):
+  def __init__(
+    self, *args, state: StateBackend = None, connect_timeout=60,
+    reply_timeout=None, **kwargs
+  ):
     super().__init__(*args, **kwargs)
 
-    self.server = AsyncMultiServer()
-
-    super().route(f"{INJECTED_SCRIPT_SRC}")(self.__bridge_js)
+    # MemoryState for a single process, SocketState to share across workers
+    self.state = state or MemoryState()
+    self.state.subscribe(self.__on_relay)
+
+    # calls to a page raise TimeoutError when it doesn't reply within
+    # `reply_timeout` seconds, None waits as long as it stays connected
+    self.server = AsyncMultiServer(reply_timeout=reply_timeout)
+    self.server.namespaces = self.state.callbacks
+    # route tasks keep running after their response is returned
+    self.__tasks = set()
+    # conn_id -> response, kept (with the tree it sent) until the page
+    # opens its socket, which then holds it, as Reactive values only hold
+    # the elements they update weakly. Pages that don't connect within
+    # `connect_timeout` seconds are forgotten, None keeps them forever.
+    self.__pages = {}
+    self.connect_timeout = connect_timeout
+
+    self.__loop = None
+    # sockets relayed from other processes, and to them
+    self.__relayed = {}
+    self.__relaying = {}
+
+    # compress the bridge now rather than on the first page load
+    bridge_js_encodings()
+    super().route(injected_script_src())(self.__bridge_js)
+    # unversioned, for pages that hardcoded it
+    super().route("/__web_route_js__")(self.__bridge_js)
+    super().route(CONNECT_SCRIPT_SRC)(self.__connect_js)
     self.websocket_route("/__web_route_ws__/{conn_id:str}")(
       self.__websocket_handler
     )
 
   async def __websocket_handler(self, websocket: WebSocket):
     conn_id = websocket.path_params['conn_id']
+    self.__loop = asyncio.get_running_loop()
 
     await websocket.accept()
+
+    owner = self.state.owner(conn_id)
+    if owner is not None and owner != self.state.id:
+      return await self.__relay_socket(websocket, conn_id, owner)
+
+    await self.__serve_socket(WebSocketWrapper(websocket), conn_id)
+
+  async def serve_socket(self, socket, conn_id):
+    """
+    Serves `socket` (with async `receive`, `send` and `close`) as the
+    page `conn_id`'s connection, as its WebSocket would be. For clients
+    that don't come in over HTTP, such as client.JSBridgeClient.
+    """
+    await self.__serve_socket(socket, conn_id)
+
+  async def __serve_socket(self, socket, conn_id):
+    # the page is held for as long as its socket is open
+    response = self.__pages.pop(conn_id, None)
     try:
-      await self.server.handle_connection(WebSocketWrapper(websocket), conn_id)
+      await self.server.handle_connection(socket, conn_id)
     finally:
-      print(conn_id, self.server.exec_context)
-      for key in list(self.server.exec_context.keys()):
-        if key.endswith(conn_id):
-          self.server.exec_context.pop(key)
-      print(conn_id, self.server.exec_context)
+      self.state.drop(conn_id)
+      self.state.release(conn_id)
+      del response
+
+  def __pending(self, response):
+    """Keeps `response` until its page connects, or gives up on it"""
+    self.state.claim(response.id)
+    self.__pages[response.id] = response
+
+    if self.connect_timeout is not None:
+      asyncio.get_running_loop().call_later(
+        self.connect_timeout, self.__expire, response.id
+      )
+
+  def __expire(self, conn_id):
+    if self.__pages.pop(conn_id, None) is None:
+      # its socket opened
+      return
+
+    self.state.drop(conn_id)
+    self.state.release(conn_id)
+    self.server.abandon(conn_id)
+
+  async def __relay_socket(self, websocket, conn_id, owner):
+    """Forwards a socket whose page was rendered by another process"""
+    self.__relaying[conn_id] = websocket
+    self.state.relay(owner, ("open", conn_id, self.state.id))
+
+    try:
+      while True:
+        frame = await websocket.receive_text()
+        self.state.relay(owner, ("frame", conn_id, frame))
+    except WebSocketDisconnect:
+      pass
+    finally:
+      self.__relaying.pop(conn_id, None)
+      self.state.relay(owner, ("frame", conn_id, None))
+
+  def __on_relay(self, message):
+    # runs on the relay's thread
+    action, conn_id, *args = message
 
-  def __bridge_js(self, request):
-    return PlainTextResponse(BridgeJS)
+    if action == "open":
+      # registered right away, the frames that follow may beat the task
+      socket = self.__relayed[conn_id] = RelayedSocket(
+        self.state, *args, conn_id, self.__loop
+      )
+      asyncio.run_coroutine_threadsafe(
+        self.__serve_relayed(socket, conn_id), self.__loop
+      )
+    elif action == "frame":
+      socket = self.__relayed.get(conn_id)
+      if socket:
+        socket.feed(*args)
+    elif action in ("send", "close"):
+      websocket = self.__relaying.get(conn_id)
+      if websocket:
+        if action == "send":
+          coroutine = websocket.send_text(*args)
+        else:
+          coroutine = websocket.close()
+        asyncio.run_coroutine_threadsafe(coroutine, self.__loop)
+
+  async def __serve_relayed(self, socket, conn_id):
+    try:
+      await self.__serve_socket(socket, conn_id)
+    finally:
+      self.__relayed.pop(conn_id, None)
+
+  def snapshot(self):
+    """The bridge's metrics and the shared pools' stats, as plain data"""
+    return {**self.server.metrics.snapshot(), "pools": pool_stats()}
+
+  def expose_metrics(self, path="/metrics"):
+    """Serves the bridge's metrics at `path` in Prometheus' text format"""
+    super().route(path)(self.__metrics)
+
+  def __metrics(self, request):
+    return Response(
+      self.server.metrics.prometheus(),
+      media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
-  def __route_wrapper(self, func):
+  def __bridge_js(self, request: Request):
+    etag = f'"{bridge_js()[2]}"'
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+
+    if request.url.path == injected_script_src():
+      headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+      headers["Cache-Control"] = "no-cache"
+
+    if etag_matches(request, etag):
+      return Response(status_code=304, headers=headers)
+
+    accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+    for coding, body in bridge_js_encodings().items():
+      if coding in accepted or "*" in accepted or coding == "identity":
+        break
+
+    if coding != "identity":
+      headers["Content-Encoding"] = coding
+
+    return Response(
+      body, headers=headers, media_type="application/javascript"
+    )
+
+  async def __connect_js(self, request: Request):
+    """A new connection's bootstrap, for a page served from the cache"""
+    response = BridgeResponse(server=self.server, state=self.state)
+    self.__pending(response)
+
+    return Response(
+      response.bootstrap, headers={"Cache-Control": "no-store"},
+      media_type="application/javascript"
+    )
+
+  async def __receive(self, response, task):
+    """The next part the route sends, None once it returned without one"""
+    body = asyncio.ensure_future(response.get())
+    await asyncio.wait((body, task), return_when=asyncio.FIRST_COMPLETED)
+
+    if body.done():
+      return body.result()
+
+    body.cancel()
+    # the handler failed before sending anything
+    if task.exception():
+      raise task.exception()
+
+    # sends from an executor thread land before its result does
+    try:
+      return response.get_nowait()
+    except asyncio.QueueEmpty:
+      return None
+
+  def __cached(self, request, page, etag):
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag_matches(request, etag):
+      return Response(status_code=304, headers=headers)
+
+    # the page is shared, its connection comes from CONNECT_SCRIPT_SRC
+    return Response(page, headers=headers, media_type="text/html")
+
+  def __route_wrapper(
+    self, func, template=False, blocking=False, stream=False,
+    pages=None, vary=None, trace=False
+  ):
+    cache = {}
 
     @wraps(func)
     async def wrapper(request):
-      response = BridgeResponse(server=self.server)
+      if pages is not None:
+        key = (
+          request.url.path, tuple(sorted(request.path_params.items())),
+          vary(request) if vary else None
+        )
+        cached = pages.get(key)
+        if cached is not None:
+          return self.__cached(request, *cached)
+
+      response = BridgeResponse(
+        server=self.server, template=cache.get("template"),
+        state=self.state, stream=stream, cacheable=pages is not None
+      )
+      self.__pending(response)
+
+      loop = self.__loop = asyncio.get_running_loop()
+      # the socket's replies will be read here
+      PORTAL.serve(loop)
+
+      handler = func
+      if trace:
+        handler = traced(
+          func, f"{request.method} {request.url.path}",
+          trace if isinstance(trace, dict) else None
+        )
 
-      @async_daemon_task
       async def background():
-        task1 = asyncio.create_task(func(request, response))
+        task1 = asyncio.create_task(handler(request, response))
         task2 = asyncio.create_task(response.dispatch("send"))
-        await asyncio.gather(task1, task2)
+        result, _ = await asyncio.gather(task1, task2)
+
+        # handlers may return their page instead of sending it
+        sent = response.status == response.RESPONSE_SENT
+        if result is not None and not sent:
+          await response.send(result)
+
+      def report(task):
+        # raised once the response went out, nobody else will see it
+        if task.cancelled() or response.status != response.RESPONSE_SENT:
+          return
+        if task.exception() is not None:
+          loop.call_exception_handler({
+            "message": f"Route handler {func.__name__} failed",
+            "exception": task.exception(),
+            "future": task,
+          })
+
+      if blocking:
+        # handlers that block get a loop of their own on an executor thread
+        executor = blocking if isinstance(blocking, Executor) else None
+        task = loop.run_in_executor(executor, asyncio.run, background())
+      else:
+        task = loop.create_task(background())
+
+      self.__tasks.add(task)
+      task.add_done_callback(self.__tasks.discard)
+      task.add_done_callback(report)
+
+      if stream:
+        async def parts():
+          yield response.prelude()
+          while (part := await self.__receive(response, task)) is not None:
+            yield part
 
-      background()
+        return StreamingResponse(parts(), media_type=response.media_type)
 
-      response.body = response.render(await response.get())
+      response.body = response.render(await self.__receive(response, task))
       response.init_headers()
 
+      if response.page is not None:
+        page = static_page(response.page)
+        etag = f'W/"{hashlib.sha1(page.encode()).hexdigest()}"'
+        pages.put(key, (page, etag))
+
+        if etag_matches(request, etag):
+          return self.__cached(request, page, etag)
+        # this body has its connection's bootstrap inline, a browser must
+        # never reuse it: only the cached, static one gets an ETag
+        response.headers["Cache-Control"] = "no-store"
+
+      if template and response.template:
+        cache["template"] = response.template
+
       return response
 
     return wrapper
 
-  def route(self, *args, **kwargs):
+  def route(
+    self, *args, template=False, blocking=False, stream=False,
+    cache=False, vary=None, trace=False, **kwargs
+  ):
+    """
+    Handlers run as tasks on the server's loop. Handlers that block should
+    pass `blocking=True` (or an Executor to use instead of the loop's
+    default one) to run on an executor thread with an event loop of their
+    own.
+
+    With `template=True` the page's compiled template is kept between
+    requests and only its slots (Reactive values, callbacks and refs) are
+    rendered again. The page's tags, text and other attributes are taken
+    to be the same on every request, without comparing them, so anything
+    that changes between requests has to be a slot: a handler whose layout
+    varies shouldn't use it. A page whose slots hold different kinds of
+    values, or are missing, is rendered in full and compiled again.
+
+    With `stream=True` the doctype, head and bridge scripts are sent right
+    away, so the browser loads the bridge and connects while the handler
+    renders; `await response.write(...)` streams parts of the body ahead
+    of the final `send`.
+
+    With `cache=True` (or the number of pages to keep, or an LRUCache)
+    pages without slots are kept by path, path params and `vary(request)`,
+    and served again with an ETag, without calling the handler. A cached
+    page loads its bootstrap script from an uncached URL, so every load
+    still gets a connection of its own. Only cache pages the handler is
+    done with once sent. Subtrees marked with `element.cacheable(key)` are
+    cached across pages whether or not the route is.
+
+    With `trace=True` (or a dict of budgets, as {"round_trips": 20}) the
+    bridge operations each request's handler issues are traced, and a
+    ChattyBridgeWarning raised past the budgets (see `tracing`).
+    """
+    if cache and stream:
+      raise ValueError("Streamed routes can't be cached.")
+
+    pages = None
+    if isinstance(cache, LRUCache):
+      pages = cache
+    elif cache is True:
+      pages = LRUCache()
+    elif cache:
+      pages = LRUCache(cache)
+
     origRoute = super().route
 
     def wrapper(func):
-      return origRoute(*args, **kwargs)(self.__route_wrapper(func))
+      return origRoute(*args, **kwargs)(
+        self.__route_wrapper(
+          func, template, blocking, stream, pages, vary, trace
+        )
+      )
 
     return wrapper
 
-  def run(self):
+  def run(
+    self, host="0.0.0.0", port=8080, server="aiohttp",
+    workers=1, loop="auto", **options
+  ):
+    """
+    Serves the app through aiohttp (the default) or, with
+    `server="uvicorn"`, directly on uvicorn. `loop` picks uvicorn's event
+    loop ("auto", "asyncio" or "uvloop") and `workers` the number of
+    processes sharing `port`.
+
+    Workers need a state backend shared between processes, such as
+    SocketState: a page's WebSocket may reach any worker, and one that
+    didn't render the page relays it to the one that did. They are forked,
+    so call `run` before anything starts a thread, the bridge's pools
+    included.
+    """
+    try:
+      if server == "uvicorn":
+        self.__run_uvicorn(host, port, workers, loop, **options)
+      else:
+        self.__run_aiohttp(host, port, **options)
+    except KeyboardInterrupt as e:
+      print("* Stopping server...")
+
+    self.server.stop()
+    sys.exit(0)
+
+  def __run_aiohttp(self, host, port, **options):
     from aiohttp import web
     from aiohttp_asgi import ASGIResource
 
@@ -342,11 +1164,66 @@ class BridgeIO(Starlette):
     aiohttp_app.router.register_resource(asgi_resource)
     asgi_resource.lifespan_mount(aiohttp_app)
 
-    try:
+    print("* Starting server...")
+    web.run_app(aiohttp_app, host=host, port=port, **options)
+
+  def __run_uvicorn(self, host, port, workers, loop, **options):
+    import uvicorn
+
+    options = {"loop": loop, **options}
+
+    if workers <= 1:
       print("* Starting server...")
-      web.run_app(aiohttp_app)
-    except KeyboardInterrupt as e:
-      print("* Stopping server...")
+      return uvicorn.run(self, host=host, port=port, **options)
 
-    self.server.stop()
-    sys.exit(0)
+    # workers share the listening socket, so they have to be forked
+    if "fork" not in multiprocessing.get_all_start_methods():
+      raise RuntimeError("Running multiple workers needs os.fork")
+    context = multiprocessing.get_context("fork")
+
+    if isinstance(self.state, MemoryState):
+      raise ValueError(
+        "Workers can't share a MemoryState, pass a state backend shared "
+        "between processes, such as SocketState."
+      )
+
+    # a fork copies the locks other threads hold, but not the threads
+    if active_count() > 1:
+      raise RuntimeError(
+        "Threads were started before the workers were forked, call run() "
+        "before using the bridge."
+      )
+
+    shared = self.__bind(host, port)
+
+    processes = []
+    for _ in range(workers):
+      process = context.Process(
+        target=self.__serve_worker, args=(shared, options), daemon=True
+      )
+      process.start()
+      processes.append(process)
+
+    print(f"* Starting server with {workers} workers...")
+    try:
+      for process in processes:
+        process.join()
+    finally:
+      for process in processes:
+        process.terminate()
+      shared.close()
+
+  def __serve_worker(self, shared, options):
+    import uvicorn
+
+    config = uvicorn.Config(self, **options)
+    uvicorn.Server(config).run(sockets=[shared])
+
+  @staticmethod
+  def __bind(host, port):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
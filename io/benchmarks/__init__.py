@@ -0,0 +1,42 @@
+import sys
+import json
+import time
+import platform
+import statistics
+
+
+def measure(func, *args, repeat=5, number=1, **kwargs):
+  """
+  Times `func(*args, **kwargs)`, returning the timings (in seconds per call)
+  together with the result of the last call.
+  """
+  timings = []
+  result = None
+
+  for _ in range(repeat):
+    start = time.perf_counter()
+    for _ in range(number):
+      result = func(*args, **kwargs)
+    timings.append((time.perf_counter() - start) / number)
+
+  return {
+    "best": min(timings),
+    "median": statistics.median(timings),
+    "repeat": repeat,
+    "number": number,
+  }, result
+
+
+def report(name, results, file=None):
+  json.dump(
+    {
+      "benchmark": name,
+      "python": sys.version.split()[0],
+      "platform": platform.platform(),
+      "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+      "results": results,
+    },
+    file or sys.stdout, indent=2
+  )
+  (file or sys.stdout).write("\n")
+
@@ -0,0 +1,60 @@
+"""
+Runs the benchmark suites, writing their results as one JSON document.
+
+    python -m <package>.io.benchmarks [suite ...] [--output FILE]
+        [--recording FILE --app module:app [--path /]]
+
+Without suites every one in SUITES is run, with its default sizes. The
+replay suite needs a saved recording and the app to replay it against,
+without `--recording` it's skipped.
+"""
+import sys
+import argparse
+from importlib import import_module
+
+from . import report
+from .replay import load_app
+from ..recording import Recording
+
+SUITES = (
+  "bridge", "dom", "updates", "load", "routes", "keyed", "envelope", "leaks",
+  "imports", "replay",
+)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog="benchmarks")
+  parser.add_argument("suites", nargs="*", help=", ".join(SUITES))
+  parser.add_argument("--output", "-o", help="file to write to, or stdout")
+  parser.add_argument("--recording", help="a saved Recording, for replay")
+  parser.add_argument("--app", help="module:attribute of the app to replay on")
+  parser.add_argument("--path", default="/", help="the page replayed")
+  args = parser.parse_args(argv)
+
+  unknown = set(args.suites) - set(SUITES)
+  if unknown:
+    parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+  if args.recording and not args.app:
+    parser.error("--recording needs the --app to replay it on")
+
+  results = {}
+  for name in args.suites or SUITES:
+    options = ()
+    if name == "replay":
+      if not args.recording:
+        print("skipping replay, no --recording given", file=sys.stderr)
+        continue
+      options = (load_app(args.app), Recording.load(args.recording), args.path)
+
+    print(f"running {name}...", file=sys.stderr)
+    results[name] = import_module(f".{name}", __package__).run(*options)
+
+  if args.output:
+    with open(args.output, "w") as file:
+      report("suite", results, file)
+  else:
+    report("suite", results)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,150 @@
+"""
+Round trips to the browser, and the encoding of the messages they take.
+
+    python -m <package>.io.benchmarks.bridge [calls] [concurrency ...]
+
+A JSBridgeClient stands in for the browser, connected in-process, so what
+is measured is the bridge itself: no network and no JavaScript. Latency is
+one awaited call at a time (a property read and a method call), throughput
+is `concurrency` calls in flight at once. Encoding and decoding are timed
+per message, for the commands the server sends and the replies it reads.
+"""
+import sys
+import json
+import time
+import asyncio
+
+from . import measure, report
+from .. import BridgeIO, HTML
+from ..client import browse
+from ..metrics import Histogram
+
+
+def application():
+  app = BridgeIO()
+
+  @app.route("/")
+  async def page(request, response):
+    html = HTML(response)
+    await response.send(
+      html.div(html.h1("Title", id="title"), html.p("Some text", klass="text"))
+    )
+
+  return app
+
+
+async def latency(browser, calls):
+  results = []
+
+  for operation, call in (
+    ("get", lambda: browser.document.body.tagName),
+    ("call", lambda: browser.document.getElementById("title")),
+  ):
+    histogram = Histogram()
+    for _ in range(calls):
+      start = time.perf_counter()
+      await call()
+      histogram.observe(time.perf_counter() - start)
+
+    snapshot = histogram.snapshot()
+    results.append({
+      "scenario": f"latency, {operation}",
+      "calls": calls,
+      **{key: snapshot[key] for key in ("mean", "p50", "p90", "p99", "max")},
+    })
+
+  return results
+
+
+async def throughput(browser, calls, concurrency):
+  semaphore = asyncio.Semaphore(concurrency)
+
+  async def call():
+    async with semaphore:
+      await browser.document.body.tagName
+
+  start = time.perf_counter()
+  await asyncio.gather(*(call() for _ in range(calls)))
+  elapsed = time.perf_counter() - start
+
+  return {
+    "scenario": "throughput",
+    "calls": calls,
+    "concurrency": concurrency,
+    "seconds": elapsed,
+    "calls_per_second": calls / elapsed,
+  }
+
+
+def messages(conn_id):
+  """Commands as the server sends them and replies as the browser does"""
+  sent = {
+    "get": dict(
+      action="get_stack_attribute", location=None,
+      stack=["document", "body", "tagName"], message_id=1, conn_id=conn_id
+    ),
+    "call": dict(
+      action="call_stack", location="12", stack=["setAttribute"],
+      args=["class", "item selected"], kwargs={}, new=False,
+      message_id=2, conn_id=conn_id
+    ),
+  }
+  received = {
+    "primitive": dict(response="DIV", message_id=1, conn_id=conn_id),
+    "proxy": dict(
+      response={"type": "bridge_proxy", "obj_type": "object", "location": "7"},
+      message_id=2, conn_id=conn_id
+    ),
+    "array": dict(
+      response=[
+        {"type": "bridge_proxy", "obj_type": "object", "location": str(index)}
+        for index in range(100)
+      ],
+      message_id=3, conn_id=conn_id
+    ),
+  }
+  return sent, {name: json.dumps(message) for name, message in received.items()}
+
+
+def encoding(server, connection, number):
+  sent, received = messages(connection.__conn_id__)
+  results = []
+
+  for name, message in sent.items():
+    timing, data = measure(server.encode, message, number=number)
+    results.append({
+      "scenario": f"encode, {name}",
+      "bytes": len(data),
+      "microseconds": timing["best"] * 1e6,
+    })
+
+  for name, data in received.items():
+    timing, _ = measure(server.decode, data, connection, number=number)
+    results.append({
+      "scenario": f"decode, {name}",
+      "bytes": len(data),
+      "microseconds": timing["best"] * 1e6,
+    })
+
+  return results
+
+
+async def main(calls, concurrency):
+  app = application()
+  _, browser = await browse(app)
+
+  results = await latency(browser, calls)
+  for level in concurrency:
+    results.append(await throughput(browser, calls, level))
+  results.extend(encoding(app.server, browser, number=calls))
+  return results
+
+
+def run(calls=2000, concurrency=(1, 10, 100)):
+  return asyncio.run(main(calls, concurrency))
+
+
+if __name__ == "__main__":
+  calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+  concurrency = tuple(int(arg) for arg in sys.argv[2:]) or (1, 10, 100)
+  report("bridge", run(calls, concurrency))
@@ -0,0 +1,81 @@
+"""
+Building, serializing and querying `dom.core` documents.
+
+    python -m <package>.io.benchmarks.dom [size ...]
+
+Documents of `size` nodes are rows of ten cells, each an element and its
+text, built the way `dom.HTML` builds them: children passed to their
+parent's constructor. Appending the same nodes one `appendChild` at a
+time is measured too, only up to `append_limit` nodes as it gets slow.
+"""
+import sys
+
+from . import measure, report
+from ..dom import core
+from ..dom.tags import create_element
+
+WIDTH = 10
+
+
+def build(size):
+  document = core.Document()
+  rows = []
+  for row in range(max(1, size // (WIDTH * 2))):
+    rows.append(create_element("div", *[
+      create_element(
+        "span", f"cell {row}.{cell}", id=f"cell-{row}-{cell}",
+        **{"class": "cell"}
+      )
+      for cell in range(WIDTH)
+    ], **{"class": "row"}))
+
+  document.body.appendChild(create_element("main", *rows))
+  return document
+
+
+def append(size):
+  document = core.Document()
+  main = document.body.appendChild(document.createElement("main"))
+  for row in range(max(1, size // (WIDTH * 2))):
+    parent = main.appendChild(document.createElement("div"))
+    for cell in range(WIDTH):
+      span = document.createElement("span")
+      span.setAttribute("id", f"cell-{row}-{cell}")
+      span.appendChild(document.createTextNode(f"cell {row}.{cell}"))
+      parent.appendChild(span)
+  return document
+
+
+def run(sizes=(1000, 10000, 100000), append_limit=1000):
+  results = []
+
+  for size in sizes:
+    repeat = 3 if size < 100000 else 1
+    result = {"size": size}
+
+    timing, document = measure(build, size, repeat=repeat)
+    result["build_seconds"] = timing
+
+    if size <= append_limit:
+      result["append_seconds"], _ = measure(append, size, repeat=repeat)
+
+    timing, html = measure(str, document, repeat=repeat)
+    result["serialize_seconds"] = timing
+    result["bytes"] = len(html)
+
+    last = f"cell-{size // (WIDTH * 2) - 1}-{WIDTH - 1}"
+    for kind, selector in (("tag", "span"), ("class", ".cell"), ("id", f"#{last}")):
+      timing, nodes = measure(document.querySelectorAll, selector, repeat=repeat)
+      result[f"querySelectorAll {kind}"] = {**timing, "matches": len(nodes)}
+
+    timing, node = measure(document.getElementById, last, repeat=repeat)
+    result["getElementById"] = {**timing, "found": bool(node)}
+
+    results.append(result)
+
+  return results
+
+
+if __name__ == "__main__":
+  sizes = tuple(int(size) for size in sys.argv[1:]) or (1000, 10000, 100000)
+  report("dom", run(sizes))
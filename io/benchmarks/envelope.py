@@ -0,0 +1,114 @@
+"""
+Bytes and CPU per bridge call, before and after compact envelopes.
+
+    python -m <package>.io.benchmarks.envelope [calls]
+
+Encodes a property read and a callback call the way the server sends
+them, and decodes the browser's replies, once with the verbose envelope
+and random ids the bridge used to send and once with counters and the
+compact envelope. Proxy keys are compared the same way, with a page that
+already handed a few hundred objects to the browser.
+"""
+import sys
+import json
+from itertools import count
+
+from . import measure, report
+from ..pybridge import (
+  AsyncMultiServer, generate_random_id, get_decoder, compact_envelope
+)
+
+CONN_ID = "4817302941"
+
+
+def messages(next_id, compact):
+  """One round trip: a property read, then a callback call and its reply"""
+  sent = [
+    dict(
+      action="get_stack_attribute", location=None,
+      stack=["document", "title"], message_id=next_id(), conn_id=CONN_ID
+    ),
+    dict(response="Page title", message_id=next_id(), conn_id=CONN_ID),
+  ]
+  received = [
+    dict(message_id=sent[0]["message_id"], conn_id=CONN_ID, response="Title"),
+    dict(
+      action="exec", target="increment_0", args=[1], message_id=next_id(),
+      conn_id=CONN_ID
+    ),
+  ]
+
+  if compact:
+    sent = [compact_envelope(message) for message in sent]
+    received = [compact_envelope(message) for message in received]
+  return sent, [json.dumps(message) for message in received]
+
+
+def call(server, connection, next_id, compact):
+  sent, received = messages(next_id, compact)
+  size = 0
+
+  for message in sent:
+    size += len(server.encode(message)) + len(";[::];")
+  for message in received:
+    decoder = connection.__decoder__ if compact else get_decoder(connection)
+    json.loads(message, cls=decoder)
+    size += len(message) + len(";[::];")
+  return size
+
+
+def old_proxy_key(proxies, arg):
+  for key, value in proxies.items():
+    if value == arg:
+      return key
+
+  key = generate_random_id(15) + str(id(arg))
+  proxies[key] = arg
+  return key
+
+
+def run(calls=20000):
+  server = AsyncMultiServer()
+  connection = server.create_connection(conn_id=CONN_ID)
+  results = []
+
+  for mode, next_id, compact in (
+    ("verbose", generate_random_id, False),
+    ("compact", count(1).__next__, True),
+  ):
+    timing, size = measure(
+      call, server, connection, next_id, compact, number=calls
+    )
+    results.append({
+      "mode": mode,
+      "calls": calls,
+      "bytes_per_call": size,
+      "microseconds_per_call": timing["best"] * 1e6,
+    })
+
+  objects = [object() for _ in range(500)]
+  old = {}
+  for arg in objects:
+    old_proxy_key(old, arg)
+  for arg in objects:
+    server.proxy_object(arg)
+
+  for mode, key in (
+    ("random keys", lambda arg: old_proxy_key(old, arg)),
+    ("counters", server.proxy_object),
+  ):
+    timing, _ = measure(
+      lambda: [key(arg) for arg in objects[-50:]], number=100
+    )
+    results.append({
+      "mode": f"proxy keys, {mode}",
+      "proxies": len(objects),
+      "microseconds_per_key": timing["best"] / 50 * 1e6,
+    })
+
+  return results
+
+
+if __name__ == "__main__":
+  calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+  report("envelope", run(calls))
@@ -0,0 +1,94 @@
+"""
+Cold import time of the package and of its parts.
+
+    python -m <package>.io.benchmarks.imports [repeat]
+
+Every module in MODULES is imported `repeat` times, each in a fresh
+interpreter, timing the import alone (not the interpreter's start). Also
+reported are how many modules the import loaded, which of the HEAVY ones
+(left to load on first use) it loaded anyway, and the slowest modules by
+their own import time, as `python -X importtime` measures it. With
+PYTHONDONTWRITEBYTECODE set, compiling the modules is part of every import.
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+from . import report
+
+# the package, `io`
+ROOT = __package__.rsplit(".", 1)[0]
+
+MODULES = ("", ".dom", ".dom.core", ".client", ".recording")
+
+HEAVY = (
+  "starlette", "bs4", "elementpath", "cssselect",
+  f"{ROOT}.dom.core", f"{ROOT}.dom.style", f"{ROOT}.dom.events",
+)
+
+CHILD = """
+import sys, json, time
+before = set(sys.modules)
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = set(sys.modules) - before
+print(json.dumps({{
+  "seconds": elapsed,
+  "modules": len(loaded),
+  "heavy": [name for name in {heavy!r} if name in loaded],
+}}))
+"""
+
+
+def import_once(module):
+  result = subprocess.run(
+    [
+      sys.executable, "-X", "importtime", "-c",
+      CHILD.format(module=module, heavy=HEAVY),
+    ],
+    capture_output=True, text=True, check=True,
+    env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+  )
+
+  slowest = []
+  for line in result.stderr.splitlines():
+    if not line.startswith("import time:") or "self [us]" in line:
+      continue
+    own, _, name = line[len("import time:"):].split("|")
+    slowest.append((int(own), name.strip()))
+  slowest.sort(reverse=True)
+
+  return json.loads(result.stdout), slowest[:5]
+
+
+def run(repeat=5):
+  results = []
+
+  for suffix in MODULES:
+    module = ROOT + suffix
+    timings, slowest = [], None
+    for _ in range(repeat):
+      timing, slowest = import_once(module)
+      timings.append(timing)
+
+    seconds = [timing["seconds"] for timing in timings]
+    results.append({
+      "module": module,
+      "best_seconds": min(seconds),
+      "median_seconds": statistics.median(seconds),
+      "modules": timings[-1]["modules"],
+      "heavy": timings[-1]["heavy"],
+      "slowest": [
+        {"module": name, "seconds": own / 1e6} for own, name in slowest
+      ],
+    })
+
+  return results
+
+
+if __name__ == "__main__":
+  repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+  report("imports", run(repeat))
@@ -0,0 +1,74 @@
+"""
+Keyed list reconciliation vs. positional matching.
+
+    python -m <package>.io.benchmarks.keyed [size ...]
+
+For every scenario this reports how many DOM operations the keyed diff
+emits, how many nodes the positional diff would rewrite, and how long
+computing the keyed operations takes.
+"""
+import sys
+import random
+
+from . import measure, report
+from ..ui import keyed_diff
+
+
+def prepend(keys):
+  return ["new"] + keys
+
+
+def reverse(keys):
+  return keys[::-1]
+
+
+def shuffle(keys):
+  keys = keys[:]
+  random.Random(0).shuffle(keys)
+  return keys
+
+
+def swap(keys):
+  keys = keys[:]
+  keys[1], keys[-2] = keys[-2], keys[1]
+  return keys
+
+
+SCENARIOS = {
+  "prepend": prepend,
+  "reverse": reverse,
+  "shuffle": shuffle,
+  "swap": swap,
+}
+
+
+def positional_writes(old_keys, new_keys):
+  """Nodes touched when children are matched by index only."""
+  changed = sum(1 for old, new in zip(old_keys, new_keys) if old != new)
+  return changed + abs(len(old_keys) - len(new_keys))
+
+
+def run(sizes=(1000, 10000)):
+  results = []
+
+  for size in sizes:
+    old_keys = [str(index) for index in range(size)]
+
+    for name, scenario in SCENARIOS.items():
+      new_keys = scenario(old_keys)
+      timing, operations = measure(keyed_diff, old_keys, new_keys)
+
+      results.append({
+        "scenario": name,
+        "size": size,
+        "keyed_operations": len(operations),
+        "positional_writes": positional_writes(old_keys, new_keys),
+        "keyed_diff_seconds": timing,
+      })
+
+  return results
+
+
+if __name__ == "__main__":
+  sizes = tuple(int(size) for size in sys.argv[1:]) or (1000, 10000)
+  report("keyed", run(sizes))
@@ -0,0 +1,95 @@
+"""
+Hook and subscription growth across repeated renders.
+
+    python -m <package>.io.benchmarks.leaks [renders]
+
+Renders the same page (a Reactive child, a Reactive attribute, a Ref and
+a callback) over and over, both re-compiling one tree and building a fresh
+tree from the same document each time, into a BridgeResponse. Reported
+are how many hooks, dependents and callbacks are registered afterwards,
+and how many of the page's handlers are still alive, whatever holds them.
+Every count should stay flat however many renders are done;
+`exit status 1` means something grew.
+"""
+import gc
+import sys
+import tracemalloc
+from types import FunctionType
+
+from . import report
+from .. import BridgeResponse
+from ..ui import HTML
+from ..pybridge import AsyncMultiServer
+
+
+def page(html, count, ref):
+  def increment(event):
+    pass
+
+  return html.div(
+    html.span(count, klass="count"),
+    html.button("+", onclick=increment, ref=ref),
+    title=count,
+  )
+
+
+def counts(response, count):
+  gc.collect()
+  return {
+    "send_hooks": len(response.events.get("send", ())),
+    "dependents": len(count.dependents),
+    "callbacks": len(response.__context__),
+    "live_handlers": sum(
+      1 for item in gc.get_objects()
+      if type(item) is FunctionType and item.__name__ == "increment"
+    ),
+  }
+
+
+def run(renders=10000):
+  results = []
+  tracemalloc.start()
+
+  for scenario in ("recompile", "rebuild"):
+    response = BridgeResponse(server=AsyncMultiServer())
+    count = HTML.Reactive(0)
+    ref = HTML.Ref()
+
+    html = HTML(response)
+    tree = page(html, count, ref)
+
+    def render():
+      nonlocal tree
+      if scenario == "rebuild":
+        tree = page(html, count, ref)
+      str(tree)
+
+    # the document keeps its first tree as main, warm up past it
+    render()
+    first = counts(response, count)
+    before, _ = tracemalloc.get_traced_memory()
+
+    for _ in range(renders):
+      render()
+
+    last = counts(response, count)
+    after, _ = tracemalloc.get_traced_memory()
+
+    results.append({
+      "scenario": scenario,
+      "renders": renders,
+      "first": first,
+      "last": last,
+      "retained_bytes": after - before,
+      "grew": last != first,
+    })
+
+  tracemalloc.stop()
+  return results
+
+
+if __name__ == "__main__":
+  renders = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+  results = run(renders)
+  report("leaks", results)
+  sys.exit(any(result["grew"] for result in results))
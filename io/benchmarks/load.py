@@ -0,0 +1,201 @@
+"""
+Many browsers at once: concurrent sessions of JSBridgeClients, each
+connected over its page's WebSocket the way a browser would be.
+
+    python -m <package>.io.benchmarks.load [sessions] [clicks]
+    python -m <package>.io.benchmarks.load [sessions] [clicks] --url URL --target SELECTOR
+
+Every session loads the page, connects, then clicks `target` `clicks`
+times, one after another. Reported are the latency percentiles of loading
+and connecting and of each click (its callback's round trip, including
+what the callback asks of the browser), and the clicks done per second.
+Sessions of the application below also check that the page shows the
+count of their clicks afterwards, as a browser would, and report an
+error when it doesn't.
+
+Without --url the application below is served by uvicorn in a child
+process, and the server's CPU time, memory, threads and bridge metrics
+are reported as well. Against another app only the sessions' side is.
+"""
+import json
+import time
+import socket
+import asyncio
+import resource
+import argparse
+import threading
+import multiprocessing
+from urllib.request import urlopen
+
+from . import report
+from .. import BridgeIO, HTML, Reactive
+from ..client import open_session
+from ..metrics import Histogram
+
+PERCENTILES = ("mean", "p50", "p90", "p99", "max")
+
+
+def application():
+  app = BridgeIO()
+
+  @app.route("/")
+  async def page(request, response):
+    html = HTML(response)
+    clicks = Reactive(0)
+
+    async def increment(event):
+      # a round trip to the browser, as most callbacks make
+      if await event.type == "click":
+        await clicks.set(clicks.get() + 1)
+
+    await response.send(html.div(
+      html.button("+", onclick=increment, id="increment"),
+      html.span(clicks, id="clicks"),
+    ))
+
+  async def usage(request):
+    from starlette.responses import JSONResponse
+
+    rusage = resource.getrusage(resource.RUSAGE_SELF)
+    return JSONResponse({
+      "cpu_seconds": rusage.ru_utime + rusage.ru_stime,
+      "max_rss_kb": rusage.ru_maxrss,
+      "threads": threading.active_count(),
+      "metrics": app.snapshot(),
+    })
+
+  app.add_route("/__usage__", usage)
+  return app
+
+
+def serve(port):
+  import uvicorn
+
+  uvicorn.run(application(), host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_server():
+  """Serves `application` in a child process, returns it and its url"""
+  with socket.socket() as probe:
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+
+  process = multiprocessing.Process(target=serve, args=(port,), daemon=True)
+  process.start()
+
+  url = f"http://127.0.0.1:{port}/"
+  for _ in range(100):
+    try:
+      urlopen(url + "__usage__").read()
+      return process, url
+    except OSError:
+      time.sleep(0.1)
+
+  process.terminate()
+  raise RuntimeError("The server didn't start.")
+
+
+def server_usage(url):
+  return json.loads(urlopen(url + "__usage__").read())
+
+
+async def shown(client, selector, text, timeout=1):
+  """Whether the node at `selector` reads `text` within `timeout` seconds"""
+  deadline = time.perf_counter() + timeout
+  while True:
+    node = client.query(selector)
+    if node is not None and node.textContent == text:
+      return True
+    if time.perf_counter() > deadline:
+      return False
+    await asyncio.sleep(0.01)
+
+
+async def session(
+  url, target, clicks, connects, latencies, errors, expected=None
+):
+  try:
+    start = time.perf_counter()
+    client = await open_session(url)
+    connects.observe(time.perf_counter() - start)
+  except Exception as e:
+    errors.append(f"connect: {e}")
+    return
+
+  try:
+    node = client.query(target)
+    for _ in range(clicks):
+      start = time.perf_counter()
+      await client.dispatch(node, "click")
+      latencies.observe(time.perf_counter() - start)
+
+    # updates are flushed after the click returns
+    if expected and not await shown(client, *expected):
+      selector, text = expected
+      errors.append(f"render: {selector} doesn't read {text!r}")
+  except Exception as e:
+    errors.append(f"click: {str(e).splitlines()[-1] if str(e) else repr(e)}")
+  finally:
+    await client.transport.close()
+
+
+async def drive(url, sessions, clicks, target, expected=None):
+  connects, latencies, errors = Histogram(), Histogram(), []
+
+  start = time.perf_counter()
+  await asyncio.gather(*(
+    session(url, target, clicks, connects, latencies, errors, expected)
+    for _ in range(sessions)
+  ))
+  elapsed = time.perf_counter() - start
+
+  connected, clicked = connects.snapshot(), latencies.snapshot()
+  return {
+    "sessions": sessions,
+    "clicks": clicks,
+    "connected": connected["count"],
+    "seconds": elapsed,
+    "clicks_per_second": clicked["count"] / elapsed,
+    "connect": {key: connected[key] for key in PERCENTILES},
+    "click": {key: clicked[key] for key in PERCENTILES},
+    "errors": len(errors),
+    # the first few, the rest are usually the same
+    "error_samples": sorted(set(errors))[:5],
+  }
+
+
+def run(sessions=100, clicks=10, url=None, target="#increment"):
+  process = expected = None
+  if url is None:
+    process, url = start_server()
+    expected = ("#clicks", str(clicks))
+
+  try:
+    before = server_usage(url) if process else None
+    result = asyncio.run(drive(url, sessions, clicks, target, expected))
+
+    if process:
+      after = server_usage(url)
+      result["server"] = {
+        "cpu_seconds": after["cpu_seconds"] - before["cpu_seconds"],
+        "max_rss_kb": after["max_rss_kb"],
+        "threads": after["threads"],
+        "metrics": after["metrics"],
+      }
+  finally:
+    if process:
+      process.terminate()
+      process.join()
+
+  return [result]
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(prog="load")
+  parser.add_argument("sessions", nargs="?", type=int, default=100)
+  parser.add_argument("clicks", nargs="?", type=int, default=10)
+  parser.add_argument("--url", help="a running app, instead of the one here")
+  parser.add_argument("--target", default="#increment", help="what to click")
+  args = parser.parse_args()
+
+  report("load", run(args.sessions, args.clicks, args.url, args.target))
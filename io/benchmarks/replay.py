@@ -0,0 +1,47 @@
+"""
+A recorded session replayed against the current build, compared with the
+recording.
+
+    python -m <package>.io.benchmarks.replay module:app session.jsonl [--path /] [--timing]
+
+`app` is the BridgeIO app in `module`, the recording one saved from
+`app.server.recordings` (see `recording`). Reported are round trips,
+callbacks, frames, bytes and latency percentiles before and after;
+`exit status 1` means the replay took more round trips than the recording,
+by more than `--tolerance` (a ratio, 0.1 for 10%).
+"""
+import sys
+import asyncio
+import argparse
+from importlib import import_module
+
+from . import report
+from ..recording import Recording, replay, compare
+
+
+def load_app(reference):
+  module, _, name = reference.partition(":")
+  return getattr(import_module(module), name or "app")
+
+
+def run(app, recording, path="/", timing=False):
+  replayed = asyncio.run(replay(recording, app, path, timing))
+  return compare(recording, replayed)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(prog="replay")
+  parser.add_argument("app", help="module:attribute of the BridgeIO app")
+  parser.add_argument("recording", help="a saved Recording")
+  parser.add_argument("--path", default="/", help="the page the session was on")
+  parser.add_argument("--timing", action="store_true", help="keep the recorded pace")
+  parser.add_argument("--tolerance", type=float, default=0.0)
+  args = parser.parse_args()
+
+  results = run(
+    load_app(args.app), Recording.load(args.recording), args.path, args.timing
+  )
+  report("replay", results)
+
+  round_trips = results["round_trips"]
+  sys.exit(round_trips["after"] > round_trips["before"] * (1 + args.tolerance))
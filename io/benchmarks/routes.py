@@ -0,0 +1,75 @@
+"""
+Requests per second of in-loop routes vs. routes run on an executor.
+
+    python -m <package>.io.benchmarks.routes [requests] [concurrency]
+
+Serves the same page from a default route (a task on the server's loop)
+and from a `blocking=True` route (an executor thread with a loop of its
+own), driving both in-process through httpx's ASGI transport.
+"""
+import sys
+import time
+import asyncio
+
+from . import report
+from .. import BridgeIO, HTML
+
+
+def application():
+  app = BridgeIO()
+
+  async def page(request, response):
+    html = HTML(response)
+    await response.send(
+      html.div(html.h1("Hello"), html.p("Some text", klass="text"))
+    )
+
+  app.route("/loop")(page)
+  app.route("/executor", blocking=True)(page)
+  return app
+
+
+async def drive(app, path, requests, concurrency):
+  import httpx
+
+  semaphore = asyncio.Semaphore(concurrency)
+  transport = httpx.ASGITransport(app=app)
+
+  async with httpx.AsyncClient(
+    transport=transport, base_url="http://bench"
+  ) as client:
+
+    async def request():
+      async with semaphore:
+        response = await client.get(path)
+        response.raise_for_status()
+
+    # warm up
+    await request()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(requests)))
+    return time.perf_counter() - start
+
+
+def run(requests=1000, concurrency=50):
+  app = application()
+  results = []
+
+  for mode, path in (("loop", "/loop"), ("executor", "/executor")):
+    elapsed = asyncio.run(drive(app, path, requests, concurrency))
+
+    results.append({
+      "mode": mode,
+      "requests": requests,
+      "concurrency": concurrency,
+      "seconds": elapsed,
+      "requests_per_second": requests / elapsed,
+    })
+
+  return results
+
+
+if __name__ == "__main__":
+  args = [int(arg) for arg in sys.argv[1:]]
+  report("routes", run(*args))
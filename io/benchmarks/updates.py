@@ -0,0 +1,235 @@
+"""
+Updating a page in the browser: `ui.diff` and update flushes.
+
+    python -m <package>.io.benchmarks.updates [rows ...]
+
+The page is served to a JSBridgeClient standing in for the browser, so
+every DOM operation is a real round trip through the bridge. For lists of
+`rows` items this reports time and round trips per update:
+
+    diff       `ui.diff` of a list against a changed copy of itself
+    flush      Reactive values changed and the UpdateScheduler flushed once
+    mutations  a sent `dom.core` document changed in place, until the
+               client has the change; its MutationObserver only looks
+               every 0.1s, which the times include
+"""
+import sys
+import time
+import asyncio
+
+from . import report
+from .. import BridgeIO, HTML, Reactive, diff
+from ..client import browse
+from ..dom import core
+from ..tracing import trace
+
+UNBUDGETED = {"round_trips": None, "serial_depth": None, "batchable": None}
+
+
+def application(rows):
+  app = BridgeIO()
+  pages = []
+
+  @app.route("/")
+  async def page(request, response):
+    html = HTML(response)
+    cells = [Reactive(f"cell {index}") for index in range(rows)]
+    # flushed by the benchmark rather than on a timer
+    response.scheduler.interval = 3600
+    pages.append((response, html, cells))
+
+    await response.send(html.div(
+      html.ul(*[html.li(cell) for cell in cells], id="reactive"),
+      html.ul(*items(html, rows), id="static"),
+    ))
+
+  return app, pages
+
+
+def document_application(rows):
+  app = BridgeIO()
+  documents = []
+
+  @app.route("/")
+  async def page(request, response):
+    document = core.Document()
+    items = document.createElement("ul")
+    items.setAttribute("id", "rows")
+    for index in range(rows):
+      item = document.createElement("li")
+      item.key = str(index)
+      item.appendChild(document.createTextNode(f"row {index}"))
+      items.appendChild(item)
+
+    document.body.appendChild(items)
+    documents.append(document)
+    await response.send(document)
+
+  return app, documents
+
+
+def items(html, rows, changed=0, label="item"):
+  return [
+    html.li(f"{label if index < changed else 'item'} {index}", klass="row")
+    for index in range(rows)
+  ]
+
+
+async def measured(func, *args):
+  with trace("benchmark", UNBUDGETED) as current:
+    start = time.perf_counter()
+    await func(*args)
+    elapsed = time.perf_counter() - start
+  return elapsed, current.summary()
+
+
+def result(scenario, rows, updates):
+  seconds = [elapsed for elapsed, _ in updates]
+  return {
+    "scenario": scenario,
+    "rows": rows,
+    "updates": len(updates),
+    "best_seconds": min(seconds),
+    "mean_seconds": sum(seconds) / len(seconds),
+    "round_trips": sum(summary["round_trips"] for _, summary in updates)
+    / len(updates),
+    "serial_depth": sum(summary["serial_depth"] for _, summary in updates)
+    / len(updates),
+  }
+
+
+async def diffs(browser, html, rows, number):
+  dom = await browser.document.getElementById("static")
+  # as the response does before diffing
+  await browser.JSBridge.cleanDom(dom)
+  base = html.ul(*items(html, rows), id="static")
+  results = []
+
+  for scenario, changed in (
+    ("unchanged", base),
+    ("one row", html.ul(*items(html, rows, 1, "changed"), id="static")),
+    ("all rows", html.ul(*items(html, rows, rows, "changed"), id="static")),
+    ("append", html.ul(*items(html, rows + 1), id="static")),
+  ):
+    updates = []
+    # back and forth, so every diff has the same changes to make
+    for _ in range(number):
+      updates.append(await measured(diff, browser, html, changed, dom))
+      updates.append(await measured(diff, browser, html, base, dom))
+    results.append(result(f"diff, {scenario}", rows, updates))
+
+  return results
+
+
+async def flushes(response, cells, number):
+  results = []
+
+  for scenario, count in (("one", 1), ("all", len(cells))):
+    updates = []
+    for round in range(number):
+      for cell in cells[:count]:
+        await cell.set(f"cell {round}")
+      updates.append(await measured(response.scheduler.flush))
+    results.append(result(f"flush, {scenario}", len(cells), updates))
+
+  return results
+
+
+async def applied(client, change, done, timeout=10):
+  """
+  Makes `change` to the server's document and waits until `done()`,
+  returning the time it took and the commands the client answered.
+  """
+  commands = client.commands
+  start = time.perf_counter()
+  change()
+  while not done():
+    if time.perf_counter() - start > timeout:
+      raise TimeoutError("the client never got the change")
+    await asyncio.sleep(0.001)
+  return time.perf_counter() - start, client.commands - commands
+
+
+async def mutations(rows, number):
+  app, documents = document_application(rows)
+  client, _ = await browse(app)
+  items = documents[0].getElementById("rows")
+  shown = client.document.getElementById("rows")
+
+  def attributes(count, value):
+    def change():
+      for item in items.children[:count]:
+        item.setAttribute("class", value)
+
+    def done():
+      return all(
+        item.getAttribute("class") == value
+        for item in shown.children[:count]
+      )
+    return change, done
+
+  def reverse():
+    def change():
+      for item in items.children[::-1]:
+        items.removeChild(item)
+        items.appendChild(item)
+
+    def done():
+      return (
+        [item.getAttribute("key") for item in shown.children] ==
+        [item.key for item in items.children]
+      )
+    return change, done
+
+  results = []
+  for scenario, make in (
+    ("one attribute", lambda round: attributes(1, f"round {round}")),
+    ("all attributes", lambda round: attributes(rows, f"round {round}")),
+    ("reverse keyed", lambda round: reverse()),
+  ):
+    updates = [
+      await applied(client, *make(round)) for round in range(number)
+    ]
+    seconds = [elapsed for elapsed, _ in updates]
+    results.append({
+      "scenario": f"mutations, {scenario}",
+      "rows": rows,
+      "updates": len(updates),
+      "best_seconds": min(seconds),
+      "mean_seconds": sum(seconds) / len(seconds),
+      "round_trips": sum(commands for _, commands in updates) / len(updates),
+    })
+
+  # records left over from a change the client already shows are still
+  # sent, and need the loop to be running until they are
+  for observer, _ in list(documents[0].children[0].observerList):
+    observer.disconnect()
+    commands = None
+    while commands != client.commands:
+      commands = client.commands
+      await asyncio.sleep(observer.interval * 2)
+
+  return results
+
+
+async def main(rows, number):
+  app, pages = application(rows)
+  _, browser = await browse(app)
+  response, html, cells = pages[0]
+
+  results = await diffs(browser, html, rows, number)
+  results.extend(await flushes(response, cells, number))
+  results.extend(await mutations(rows, number))
+  return results
+
+
+def run(rows=(10, 100), number=5):
+  results = []
+  for size in rows:
+    results.extend(asyncio.run(main(size, number)))
+  return results
+
+
+if __name__ == "__main__":
+  rows = tuple(int(size) for size in sys.argv[1:]) or (10, 100)
+  report("updates", run(rows))
@@ -0,0 +1,752 @@
+"""
+The browser's side of the bridge, in Python.
+
+`JSBridgeClient` answers the server's commands the way js_bridge.js does,
+against a page loaded into the package's own DOM (`dom.core`) instead of a
+browser's, so the server can be driven without one. In-process:
+
+    client = JSBridgeClient(page, conn_id)
+    client.connect(app)
+    browser = await app.server.get_connection(conn_id)
+
+which `browse(app, "/")` does for a route of `app`, returning both;
+or over the page's WebSocket, as a browser would (needs `websockets`):
+
+    client = await open_session("http://localhost:8000/")
+    await client.dispatch(client.query("#save"), "click")
+
+Only the page's DOM is there: no scripts run, there is no layout, and
+`evaluate` (JavaScript source) is refused.
+"""
+import re
+import json
+import asyncio
+from itertools import count
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit, unquote
+from urllib.request import urlopen
+
+from .dom import core
+from .dom.tags import create_element
+from .pybridge import (
+  compact_envelope, expand_envelope, resolve_threadsafe, CONNECT_SCRIPT_SRC
+)
+
+SEPARATOR = ";[::];"
+
+# the handler a rendered callback calls, `client.exec('name', event)`
+CALLBACK = re.compile(r"client\.(?:exec|limit)\('([^']+)'")
+
+VOID_ELEMENTS = {
+  "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+  "meta", "param", "source", "track", "wbr",
+}
+
+
+class PageParser(HTMLParser):
+  """Collects a page as nested [tag, attributes, children] lists"""
+
+  def __init__(self):
+    super().__init__(convert_charrefs=True)
+    self.root = ["#root", {}, []]
+    self.open = [self.root]
+
+  def handle_starttag(self, tag, attrs):
+    attributes = {name: value or "" for name, value in attrs}
+    if tag in ("html", "body"):
+      # another start tag of an open one only adds its attributes
+      for node in self.open:
+        if node[0] == tag:
+          node[1] = {**attributes, **node[1]}
+          return
+
+    node = [tag, attributes, []]
+    self.open[-1][2].append(node)
+    if tag not in VOID_ELEMENTS:
+      self.open.append(node)
+
+  def handle_startendtag(self, tag, attrs):
+    self.open[-1][2].append(
+      [tag, {name: value or "" for name, value in attrs}, []]
+    )
+
+  def handle_endtag(self, tag):
+    for index in range(len(self.open) - 1, 0, -1):
+      if self.open[index][0] == tag:
+        del self.open[index:]
+        return
+
+  def handle_data(self, data):
+    self.open[-1][2].append(data)
+
+  def handle_comment(self, data):
+    self.open[-1][2].append(core.Comment(data))
+
+
+def build(node):
+  """The core element for a parsed node, built bottom-up"""
+  if isinstance(node, str):
+    return core.Text(node)
+  if not isinstance(node, list):
+    return node
+
+  name, attributes, children = node
+  return create_element(name, *[build(child) for child in children], **attributes)
+
+
+def elements(node):
+  """`node`'s element children, as a browser's `node.children`"""
+  return [child for child in node.childNodes if isinstance(child, core.Element)]
+
+
+def load_page(html):
+  """`html` parsed into a core.Document, as a browser would load it"""
+  parser = PageParser()
+  parser.feed(html)
+  parser.close()
+
+  document = core.Document()
+  page = next(
+    (node for node in parser.root[2] if isinstance(node, list) and node[0] == "html"),
+    ["html", {}, parser.root[2]]
+  )
+
+  for name, value in page[1].items():
+    elements(document)[0].setAttribute(name, value)
+
+  head, body = document.head, document.body
+  for node in page[2]:
+    if isinstance(node, list) and node[0] in ("head", "body"):
+      target = head if node[0] == "head" else body
+      for name, value in node[1].items():
+        target.setAttribute(name, value)
+      target.args = (*target.args, *(build(child) for child in node[2]))
+    elif isinstance(node, list):
+      # content after </body>, such as the bridge's scripts, ends up in it
+      body.args = (*body.args, build(node))
+  return document
+
+
+def lookup(target, key):
+  """`target[key]` with JavaScript's leniency: missing is None"""
+  if isinstance(target, dict):
+    return target.get(key)
+
+  if isinstance(target, (list, tuple)):
+    if key == "length":
+      return len(target)
+    try:
+      return target[int(key)]
+    except (ValueError, TypeError):
+      pass
+    except IndexError:
+      return None
+
+  if key == "length" and hasattr(target, "__len__"):
+    return len(target)
+  return getattr(target, str(key), None)
+
+
+# DOM properties a browser keeps as strings, whatever they're set to
+STRING_PROPERTIES = {
+  "textContent", "innerText", "innerHTML", "nodeValue", "data", "value",
+  "id", "className",
+}
+# of those, the ones that take null as empty
+NULLABLE_PROPERTIES = {"textContent", "innerText", "innerHTML", "nodeValue"}
+
+
+def js_string(value):
+  """`value` as JavaScript's String() writes it"""
+  if isinstance(value, bool):
+    return "true" if value else "false"
+  if value is None:
+    return "null"
+  if isinstance(value, float):
+    if value != value:
+      return "NaN"
+    if value in (float("inf"), float("-inf")):
+      return "Infinity" if value > 0 else "-Infinity"
+    if value.is_integer():
+      return str(int(value))
+  return str(value)
+
+
+def assign(target, key, value):
+  if isinstance(target, (dict, list)):
+    target[key] = value
+    return
+
+  if isinstance(target, core.Node) and key in STRING_PROPERTIES:
+    if value is None and key in NULLABLE_PROPERTIES:
+      value = ""
+    else:
+      value = js_string(value)
+  setattr(target, key, value)
+
+
+# a step of the paths generate_xpath builds: /name, /name[2], /name[@id='x']
+XPATH_STEP = re.compile(r"(//?)([\w-]+)(?:\[(\d+)\]|\[@id='([^']*)'\])?")
+
+
+class XPathResult:
+  """What `document.evaluate` returns, for a single node"""
+
+  def __init__(self, node):
+    self.singleNodeValue = node
+
+
+def descendants(node):
+  """`node` and the elements under it, in document order"""
+  yield node
+  for child in elements(node):
+    yield from descendants(child)
+
+
+def evaluate_xpath(xpath, context):
+  """
+  The nodes `xpath` selects from `context`, for the absolute paths of
+  element names, positions and ids that the bridge generates.
+  """
+  nodes, end = [context], 0
+  for step in XPATH_STEP.finditer(xpath):
+    if step.start() != end:
+      raise ValueError(f"Unsupported XPath: {xpath!r}")
+    end = step.end()
+
+    axis, name, position, _id = step.groups()
+    selected = []
+    for node in nodes:
+      parents = descendants(node) if axis == "//" else [node]
+      for parent in parents:
+        matches = [child for child in elements(parent) if child.name == name]
+        if position is not None:
+          matches = matches[int(position) - 1:int(position)]
+        elif _id is not None:
+          matches = [child for child in matches if child.getAttribute("id") == _id]
+        selected.extend(child for child in matches if child not in selected)
+    nodes = selected
+
+  if end != len(xpath):
+    raise ValueError(f"Unsupported XPath: {xpath!r}")
+  return nodes
+
+
+class DOMHelpers:
+  """The `JSBridge` global's DOM helpers, as in js_bridge.js"""
+
+  def __init__(self, document):
+    self.document = document
+
+  @property
+  def documentElement(self):
+    return elements(self.document)[0]
+
+  def nodeAtPath(self, path, root=None):
+    node = root or self.documentElement
+    for index in path:
+      node = lookup(elements(node), index) if node is not None else None
+    return node
+
+  def evalXpath(self, xpath, context=None, resultType=None):
+    nodes = evaluate_xpath(xpath, context or self.document)
+    return XPathResult(nodes[0] if nodes else None)
+
+  def cleanDom(self, node=None):
+    node = node or self.documentElement
+    if not isinstance(node, core.Element):
+      return
+    for child in list(node.childNodes):
+      if isinstance(child, core.Comment) or (
+        isinstance(child, core.Text)
+        and not str(child.data).strip() and "\n" in str(child.data)
+      ):
+        node.removeChild(child)
+      elif isinstance(child, core.Element):
+        self.cleanDom(child)
+
+  def childKeys(self, node):
+    return [child.getAttribute("key") for child in elements(node)]
+
+  def reconcileKeyed(self, node, operations):
+    by_key = {}
+    for child in elements(node):
+      key = child.getAttribute("key")
+      if key is None:
+        child.remove()
+      else:
+        by_key[key] = child
+
+    for action, key, before, *html in operations:
+      anchor = None if before is None else by_key.get(str(before))
+      key = str(key)
+
+      if action == "remove":
+        if key in by_key:
+          by_key.pop(key).remove()
+      elif action == "move":
+        node.insertBefore(by_key[key], anchor)
+      elif action == "insert":
+        fragment = load_page(f"<body>{html[0].strip()}</body>").body
+        created = elements(fragment)[0]
+        self.cleanDom(created)
+        by_key[key] = created
+        node.insertBefore(created, anchor)
+      elif action == "update" and key in by_key:
+        fragment = load_page(f"<body>{html[0].strip()}</body>").body
+        updated = elements(fragment)[0]
+        self.cleanDom(updated)
+        by_key[key] = morph(by_key[key], updated)
+
+
+def morph(node, updated):
+  """Brings `node` up to date with `updated`, keeping it if it can"""
+  if str(node) == str(updated):
+    return node
+  if node.name != updated.name:
+    node.parentNode.replaceChild(updated, node)
+    return updated
+
+  names = {name.lstrip("_") for name in updated.kwargs}
+  for name in list(node.kwargs):
+    if name.lstrip("_") not in names:
+      node.removeAttribute(name.lstrip("_"))
+  for name, value in updated.kwargs.items():
+    if node.getAttribute(name.lstrip("_")) != value:
+      node.setAttribute(name.lstrip("_"), value)
+
+  def content(element):
+    return "".join(str(child) for child in element.childNodes)
+
+  if content(node) != content(updated):
+    for child in list(node.childNodes):
+      node.removeChild(child)
+    for child in list(updated.childNodes):
+      node.appendChild(child)
+  return node
+
+
+class PyProxy:
+  """A Python object the server handed over, by its location"""
+
+  def __init__(self, client, data):
+    self.client = client
+    self.location = data.get("location")
+    self.obj_type = data.get("obj_type")
+
+  def __repr__(self):
+    return f"<PyProxy {self.obj_type} {self.location}>"
+
+  async def get(self, name):
+    return await self.client.recieve(
+      action="get_proxy_attribute", location=self.location, target=name
+    )
+
+  async def set(self, name, value):
+    return await self.client.recieve(
+      action="set_proxy_attribute", location=self.location, target=name,
+      value=self.client.format_arg(value)
+    )
+
+  async def __call__(self, *args, **kwargs):
+    return await self.client.recieve(
+      action="call_proxy", location=self.location,
+      args=self.client.format_arg(args),
+      kwargs={key: self.client.format_arg(value) for key, value in kwargs.items()}
+    )
+
+
+class JSBridgeClient:
+  def __init__(self, page, conn_id, compact=True):
+    self.document = page if isinstance(page, core.Document) else load_page(page)
+    self.conn_id = conn_id
+    self.compact = compact
+
+    self.proxies = {}
+    # id(object) -> key, objects are kept alive by `proxies`
+    self.proxy_keys = {}
+    self.proxy_count = 0
+
+    self.window = {
+      "document": self.document,
+      "Array": {"from": list, "isArray": lambda value: isinstance(value, list)},
+      "Boolean": bool,
+      "Object": {"keys": lambda value: list(value)},
+      "JSBridge": DOMHelpers(self.document),
+    }
+    self.window["window"] = self.window
+
+    # where encoded frames go, set by `connect` or `open_session`
+    self.outbox = None
+    self.transport = None
+    self.commands = 0
+
+    # our own calls to the server, waiting for their replies
+    self.message_ids = count(1)
+    self.message_handlers = {}
+
+  def proxy_object(self, item):
+    key = self.proxy_keys.get(id(item))
+    if key is None or self.proxies.get(key) is not item:
+      self.proxy_count += 1
+      key = str(self.proxy_count)
+      self.proxies[key] = item
+      self.proxy_keys[id(item)] = key
+    return key
+
+  def get_proxy(self, key):
+    return self.proxies.get(str(key))
+
+  def format_arg(self, value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+      return value
+    if type(value) in (list, tuple):
+      return [self.format_arg(item) for item in value]
+    if isinstance(value, PyProxy):
+      return {
+        "type": "bridge_proxy", "obj_type": "reverse_proxy",
+        "location": value.location, "reverse": True,
+      }
+
+    return {
+      "type": "bridge_proxy",
+      "obj_type": "function" if callable(value) else "object",
+      "location": self.proxy_object(value),
+    }
+
+  def get_result(self, data):
+    if data.get("type") != "bridge_proxy":
+      return data
+    if not data.get("reverse"):
+      return PyProxy(self, data)
+    if data.get("location") is not None:
+      return self.get_proxy(data["location"])
+    return self.resolve(None, data.get("stack") or [])
+
+  def decode(self, frame):
+    return expand_envelope(json.loads(frame, object_hook=self.get_result))
+
+  def encode(self, message):
+    message["conn_id"] = self.conn_id
+    if self.compact:
+      message = compact_envelope(message)
+    return SEPARATOR + json.dumps(message, default=str)
+
+  def send(self, message):
+    self.outbox(self.encode(message))
+
+  def on_frame(self, data):
+    for frame in data.split(SEPARATOR):
+      frame = frame.strip()
+      if frame:
+        self.on_message(self.decode(frame))
+
+  def on_message(self, message):
+    if not message.get("action"):
+      handler = self.message_handlers.pop(message.get("message_id"), None)
+      if handler:
+        handler(message)
+      return
+
+    self.commands += 1
+    if message["action"] == "get_primitive":
+      value = self.get_proxy(message.get("location"))
+      reply = {"value": value, "type": type(value).__name__}
+    else:
+      try:
+        reply = {"response": self.format_arg(self.process_command(message))}
+      except Exception as e:
+        reply = {"error": str(e)}
+
+    reply["message_id"] = message.get("message_id")
+    self.send(reply)
+
+  def process_command(self, request):
+    func = getattr(self, "handle_" + request["action"], None)
+    if not func:
+      raise Exception("Invalid action.")
+    return func(request)
+
+  def resolve(self, location, stack):
+    """The target `stack` leads to, from a proxy or from the window"""
+    if location:
+      target = self.get_proxy(location)
+    else:
+      target, stack = self.window.get(stack[0]), stack[1:]
+
+    for key in stack:
+      if target is None:
+        raise TypeError(f"Cannot read properties of undefined (reading '{key}')")
+      target = lookup(target, key)
+    return target
+
+  def arguments(self, request):
+    return [*(request.get("args") or []), *(request.get("kwargs") or {}).values()]
+
+  def handle_evaluate(self, request):
+    raise Exception("JavaScript can't be evaluated without a browser.")
+
+  def handle_get_stack_attribute(self, request):
+    return self.resolve(request.get("location"), request.get("stack") or [])
+
+  def handle_get_proxy_attribute(self, request):
+    return self.resolve(request.get("location"), request["target"].split("."))
+
+  def handle_get_proxy_attributes(self, request):
+    target = self.get_proxy(request.get("location"))
+    return list(target) if isinstance(target, dict) else dir(target)
+
+  def handle_set_stack_attribute(self, request):
+    target = self.resolve(request.get("location"), request.get("stack") or [])
+    assign(target, request["target"], request.get("value"))
+    return True
+
+  def handle_set_proxy_attribute(self, request):
+    assign(
+      self.get_proxy(request.get("location")), request["target"],
+      request.get("value")
+    )
+    return True
+
+  def handle_call_stack(self, request):
+    stack = request.get("stack") or []
+    func = self.resolve(request.get("location"), stack)
+    if not callable(func):
+      raise TypeError(f"{'.'.join(map(str, stack)) or 'target'} is not a function")
+    return func(*self.arguments(request))
+
+  def handle_call_proxy(self, request):
+    return self.get_proxy(request.get("location"))(*self.arguments(request))
+
+  handle_call_proxy_constructor = handle_call_proxy
+
+  def handle_import_script(self, request):
+    return None
+
+  async def recieve(self, **data):
+    """Sends the command `data` to the server and waits for its reply"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    message_id = next(self.message_ids)
+    self.message_handlers[message_id] = (
+      lambda message: resolve_threadsafe(loop, future, message)
+    )
+    self.send({**data, "message_id": message_id})
+
+    message = await future
+    if "error" in message:
+      raise Exception(message["error"])
+    return message.get("response", message.get("value"))
+
+  async def exec(self, name, *args):
+    """Calls the page's callback `name`, as `client.exec` does"""
+    return await self.recieve(
+      action="exec", target=name, args=self.format_arg(args)
+    )
+
+  def query(self, selector):
+    return self.document.querySelector(selector)
+
+  async def dispatch(self, node, type="click", **event):
+    """
+    Fires the `on<type>` handler rendered on `node` with an event object
+    (a dict: `type`, `target` and `event`), the way a browser would. Rate
+    limits set with `configure` are not applied.
+    """
+    handler = CALLBACK.search(str(node.getAttribute(f"on{type}") or ""))
+    if not handler:
+      raise ValueError(f"The node has no on{type} callback.")
+    return await self.exec(
+      handler.group(1), {"type": type, "target": node, **event}
+    )
+
+  def connect(self, server):
+    """
+    Connects to `server` in-process, the way the page would over its
+    socket: a BridgeIO app, or an AsyncMultiServer on its own. Returns the
+    task serving the connection.
+    """
+    socket = self.transport = LocalSocket(self)
+    if self.compact:
+      # as the page does when the socket opens
+      self.send({"action": "hello"})
+
+    serve = getattr(server, "serve_socket", None) or server.handle_connection
+    return asyncio.ensure_future(serve(socket, self.conn_id))
+
+
+class LocalSocket:
+  """The server's end of an in-process connection to a JSBridgeClient"""
+
+  def __init__(self, client):
+    self.client = client
+    self.loop = asyncio.get_running_loop()
+    self.inbox = asyncio.Queue()
+    client.outbox = self.put
+
+  def put(self, frame):
+    try:
+      running = asyncio.get_running_loop()
+    except RuntimeError:
+      running = None
+
+    if running is self.loop:
+      self.inbox.put_nowait(frame)
+    else:
+      self.loop.call_soon_threadsafe(self.inbox.put_nowait, frame)
+
+  async def receive(self):
+    frame = await self.inbox.get()
+    if frame is None:
+      raise ConnectionError("The connection was closed.")
+    return frame
+
+  async def send(self, data):
+    self.client.on_frame(data)
+
+  async def close(self):
+    self.put(None)
+
+
+class WebSocketTransport:
+  """A JSBridgeClient's connection to the server over the page's WebSocket"""
+
+  def __init__(self, client, socket):
+    self.client = client
+    self.socket = socket
+    self.loop = asyncio.get_running_loop()
+    self.queue = asyncio.Queue()
+    client.outbox = self.put
+
+    self.tasks = [
+      asyncio.ensure_future(self.listen()),
+      asyncio.ensure_future(self.write()),
+    ]
+
+  def put(self, frame):
+    try:
+      running = asyncio.get_running_loop()
+    except RuntimeError:
+      running = None
+
+    if running is self.loop:
+      self.queue.put_nowait(frame)
+    else:
+      self.loop.call_soon_threadsafe(self.queue.put_nowait, frame)
+
+  async def write(self):
+    # one writer, so frames go out in the order they were sent
+    while True:
+      await self.socket.send(await self.queue.get())
+
+  async def listen(self):
+    async for frame in self.socket:
+      self.client.on_frame(frame)
+
+  async def close(self):
+    for task in self.tasks:
+      task.cancel()
+    await self.socket.close()
+
+
+def connection_of(script):
+  """The conn_id and socket path a page's bootstrap script connects with"""
+  conn_id = re.search(r'conn_id: "(\w+)"', script)
+  path = re.search(r'path: "([^"]+)"', script)
+  if conn_id is None or path is None:
+    return None
+  return conn_id.group(1), path.group(1)
+
+
+async def open_session(url, compact=True, **options):
+  """
+  Loads the page at `url` and connects a JSBridgeClient to it over its
+  WebSocket, as a browser would. `options` go to `websockets.connect`.
+  The connection is `client.transport`.
+  """
+  import websockets
+
+  loop = asyncio.get_running_loop()
+
+  def load(url):
+    return urlopen(url).read().decode()
+
+  page = await loop.run_in_executor(None, load, url)
+  # a cached page gets its connection from a script of its own
+  connection = connection_of(page) or connection_of(
+    await loop.run_in_executor(None, load, urljoin(url, CONNECT_SCRIPT_SRC))
+  )
+
+  conn_id, path = connection
+  parts = urlsplit(urljoin(url, path))
+  scheme = "wss" if parts.scheme == "https" else "ws"
+
+  client = JSBridgeClient(page, conn_id, compact)
+  socket = await websockets.connect(
+    f"{scheme}://{parts.netloc}{parts.path}", **options
+  )
+  client.transport = WebSocketTransport(client, socket)
+  if compact:
+    client.send({"action": "hello"})
+  return client
+
+
+async def fetch(app, path="/"):
+  """
+  GETs `path` from the ASGI `app` in-process, returning the response's
+  status and its body as text.
+  """
+  path, _, query = path.partition("?")
+  scope = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+    "method": "GET", "scheme": "http", "root_path": "",
+    "path": unquote(path), "raw_path": path.encode(),
+    "query_string": query.encode(), "headers": [(b"host", b"localhost")],
+    "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+  }
+  status, body = None, []
+  requested, finished = False, asyncio.Event()
+
+  async def receive():
+    nonlocal requested
+    if not requested:
+      requested = True
+      return {"type": "http.request", "body": b"", "more_body": False}
+    # the client stays until the whole response is read
+    await finished.wait()
+    return {"type": "http.disconnect"}
+
+  async def send(message):
+    nonlocal status
+    if message["type"] == "http.response.start":
+      status = message["status"]
+    elif message["type"] == "http.response.body":
+      body.append(message.get("body", b""))
+      if not message.get("more_body", False):
+        finished.set()
+
+  try:
+    await app(scope, receive, send)
+  finally:
+    finished.set()
+  return status, b"".join(body).decode()
+
+
+async def browse(app, path="/"):
+  """
+  Loads `path` from the BridgeIO `app` in-process and connects a
+  JSBridgeClient to the page, standing in for the browser. Returns the
+  client and the server's connection to it.
+  """
+  _, page = await fetch(app, path)
+  # a cached page gets its connection from a script of its own
+  connection = connection_of(page)
+  if connection is None:
+    _, script = await fetch(app, CONNECT_SCRIPT_SRC)
+    connection = connection_of(script)
+
+  conn_id, _ = connection
+  client = JSBridgeClient(page, conn_id)
+  client.connect(app)
+  return client, await app.server.get_connection(conn_id)
@@ -1,5 +1,17 @@
-from .core import MutationObserver, Document
-from .tags import create_element
+"""
+The package's own DOM. `core` (with `style`, `events` and the bs4 parser
+behind it) is large, so it's imported when first used, not with the package.
+"""
+
+
+def __getattr__(name):
+  if name in ("MutationObserver", "Document"):
+    from . import core
+    return getattr(core, name)
+  if name == "create_element":
+    from .tags import create_element
+    return create_element
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class Ref:
     pass
@@ -9,6 +21,8 @@ class Reactive:
 
 class HTML:
   def __init__(self, response=None):
+    from .core import Document
+
     self.response = response
     self.__document__ = Document(response=self.response)
 
@@ -20,6 +34,8 @@ class HTML:
       return self[name]
 
   def __getitem__(self, name):
+    from .tags import create_element
+
     def wrapper(*args, **kwargs):
       tag = create_element(name, *args, **kwargs)
       return tag
@@ -16,8 +16,6 @@ from enum import Enum
 import typing as t
 
 from .helpers import *
-from .bs4_parser import HtmlToPy
-from .style import CSSStyleDeclaration as Style, StyleSheetList
 from .events import (
     Event, EventTarget, MouseEvent,
     KeyboardEvent, GLOBAL_LISTENERS
@@ -2233,7 +2231,7 @@ class Element(Node):
             return self
         try:
             for child in self.childNodes:
-                if isinstance(child, str):
+                if not isinstance(child, Element):
                     continue
                 match = child._getElementById(_id)
                 if match is not False and match is not None:
@@ -2463,6 +2461,7 @@ class Element(Node):
             # TODO - will need the parser to work for this to work properly. for now shove all on first content node
             oldValue = [*self.args]
 
+            from .bs4_parser import HtmlToPy  # bs4 is imported on first use
             self.args = (eval(HtmlToPy(value), globals()),)
             self._add_mutation(**{
                 "name": "innerHTML",
@@ -2486,6 +2485,7 @@ class Element(Node):
         if isinstance(value, Element):
             self = value
         if isinstance(value, str):
+            from .bs4_parser import HtmlToPy
             node = eval(HtmlToPy(value), globals())
             if self.parentNode:
                 self.parentNode.replaceChild(node, self)
@@ -3122,6 +3122,8 @@ class Element(Node):
     def style(self):
         """returns the value of the style attribute of an element"""
         if self.__style is None:
+            # dom.style is large, loaded by the first element styled
+            from .style import CSSStyleDeclaration as Style
             self.style = Style()
         return self.__style
 
@@ -3134,6 +3136,15 @@ class Element(Node):
     # ''' Sets or returns the value of the tabindex attribute of an element'''
     # pass
 
+    @property
+    def key(self):
+        """returns the key used to match this element against its siblings when reconciling children"""
+        return self.getAttribute("key")
+
+    @key.setter
+    def key(self, newkey):
+        self.setAttribute("key", newkey)
+
     @property
     def tagName(self):
         return self.name
@@ -3570,6 +3581,7 @@ class Document(Element):
     @property
     def stylesheets(self):
         if self.__stylesheets is None:
+            from .style import StyleSheetList
             self.stylesheets = StyleSheetList()
             self.stylesheets._populate_stylesheets_from_document(self)
         return self.__stylesheets
@@ -3861,11 +3873,13 @@ class Document(Element):
             [type]: [the element that has the ID attribute with the specified value]
         """
         for each in self.childNodes:
+            if not isinstance(each, Element):
+                continue
             if each.getAttribute("id") == _id:
                 return each
             try:
                 for child in each.childNodes:
-                    if isinstance(child, str):
+                    if not isinstance(child, Element):
                         continue
                     match = child._getElementById(_id)
                     # TODO - i think i need to build a hash map of IDs to positions on the tree
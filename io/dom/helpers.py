@@ -9,12 +9,14 @@
 """
 import urllib
 import asyncio
-import queue
 from re import sub
 from functools import wraps
 from threading import Thread
 from inspect import iscoroutinefunction
 
+from ..pybridge import PORTAL
+from ..executors import pool
+
 
 def makelist(data):  # This is just too handy
     if isinstance(data, (tuple, list, set, dict)):
@@ -50,14 +52,11 @@ def get_event_loop():
 
 def force_async(fn):
     '''
-    Turns a sync function to async function using threads
+    Turns a sync function to async function using the shared io pool
     '''
-    from concurrent.futures import ThreadPoolExecutor
-
-    pool = ThreadPoolExecutor()
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        future = pool.submit(fn, *args, **kwargs)
+        future = pool("io").submit(fn, *args, **kwargs)
         return asyncio.wrap_future(future)  # make it awaitable
     return wrapper
 
@@ -80,15 +79,9 @@ def run_sync(func):
     if not iscoroutinefunction(func):
         return func
 
+    @wraps(func)
     def wrapper(*a, **kw):
-        q = queue.Queue()
-
-        @async_daemon_task
-        async def _():
-            q.put(await func(*a, **kw))
-
-        _()
-        return q.get()
+        return PORTAL.call(func(*a, **kw))
     return wrapper
 
 class Hooks:
@@ -452,8 +445,6 @@ class URLSearchParams:
 
 from typing import Any, Callable, Dict, List, Optional, Union
 
-import elementpath
-
 
 class XPathEvaluator:
     def __init__(self) -> None:
@@ -483,6 +474,10 @@ class XPathExpression:
 
         if len(expr) <= 0:
             raise Exception("no expression")
+
+        # heavy, and only needed by the few that evaluate XPath
+        import elementpath
+
         self.selector = elementpath.Selector(expr)
 
     # TODO - DRY - make some utils . just stole this from Treewalker.
@@ -1198,12 +1193,13 @@ def generate_xpath(node):
         path = "/" + node.name
     elif len(temp_one) > 1:
         last_node_index = last_node_index + 1
-        path = "/" + node.name + "[" + last_node_index + "]"
+        path = "/" + node.name + "[" + str(last_node_index) + "]"
     else:
         path = ""
 
     while node and node.name != "html" and node.parentNode != None:
         node = node.parentNode
+        current = ""
 
         # When loop reaches the last element of the dom (body)*/
         if (node.name == "body"):
@@ -1224,7 +1220,7 @@ def generate_xpath(node):
                   node, node.parentNode.children
                 )
                 try:
-                    node_index = temp_one.index(node)
+                    node_index = temp.index(node)
                 except ValueError:
                     node_index = 1
 
@@ -1232,7 +1228,7 @@ def generate_xpath(node):
                     current = "/" + node.name
                 elif len(temp) > 1:
                     node_index = node_index + 1
-                    current = "/" + node.name + "[" + node_index + "]"
+                    current = "/" + node.name + "[" + str(node_index) + "]"
 
         path = current + path
 
@@ -1241,7 +1237,7 @@ def generate_xpath(node):
 
 def get_element_index(node, children):
   if not node:
-    return
+    return []
 
   temp = []
 
@@ -1249,5 +1245,5 @@ def get_element_index(node, children):
     if child and child.name == node.name:
       temp.append(child)
 
-    return temp
+  return temp
 
@@ -57,6 +57,79 @@ function patchAttributes(vdom, dom) {
     });
 }
 
+function childKeys(node) {
+    //keys of all element children, or null if they aren't all uniquely keyed
+    if (node.childNodes.length == 0) return null;
+    if (node.childNodes.length != node.children.length) return null;
+
+    var keys = [];
+    for (var i = 0; i < node.children.length; i++) {
+        var key = node.children[i].getAttribute("key");
+        if (key === null) return null;
+        keys.push(key);
+    }
+    if (new Set(keys).size != keys.length) return null;
+    return keys;
+}
+
+function longestIncreasingSubsequence(sequence) {
+    //indices of a longest increasing run, skipping -1 (new nodes)
+    var tails = [];
+    var previous = new Array(sequence.length).fill(-1);
+
+    for (var i = 0; i < sequence.length; i++) {
+        if (sequence[i] < 0) continue;
+
+        var lo = 0, hi = tails.length;
+        while (lo < hi) {
+            var mid = (lo + hi) >> 1;
+            if (sequence[tails[mid]] < sequence[i]) lo = mid + 1;
+            else hi = mid;
+        }
+        if (lo > 0) previous[i] = tails[lo - 1];
+        tails[lo] = i;
+    }
+
+    var result = [];
+    for (var i = tails.length ? tails[tails.length - 1] : -1; i >= 0; i = previous[i]) {
+        result.unshift(i);
+    }
+    return result;
+}
+
+function diffKeyed(vdom, dom, keys) {
+    var byKey = new Map();
+    for (var child of Array.from(dom.childNodes)) {
+        var key = child.nodeType == 1 ? child.getAttribute("key") : null;
+        //unkeyed leftovers can't be matched
+        if (key === null || !keys.includes(key)) child.remove();
+        else byKey.set(key, child);
+    }
+
+    var oldIndex = new Map();
+    Array.from(dom.children).forEach((child, i) => {
+        oldIndex.set(child.getAttribute("key"), i);
+    });
+
+    var sources = keys.map((key) => (oldIndex.has(key) ? oldIndex.get(key) : -1));
+    var stable = new Set(longestIncreasingSubsequence(sources));
+
+    //walk backwards so the anchor is always in its final place
+    var anchor = null;
+    for (var i = keys.length - 1; i >= 0; i--) {
+        var node = byKey.get(keys[i]);
+        if (sources[i] < 0) {
+            node = vdom.children[i].cloneNode(true);
+            dom.insertBefore(node, anchor);
+        } else {
+            if (!stable.has(i)) dom.insertBefore(node, anchor);
+            patchAttributes(vdom.children[i], node);
+            diff(vdom.children[i], node);
+        }
+        anchor = node;
+    }
+}
+
 function diff(vdom, dom) {
     //if dom has no childs then append the childs from vdom
     if (dom.hasChildNodes() == false && vdom.hasChildNodes() == true) {
@@ -67,6 +140,9 @@ function diff(vdom, dom) {
     } else {
         //if both nodes are equal then no need to compare farther
         if (vdom.isEqualNode(dom)) return;
+        //keyed children are matched by key instead of position
+        var keys = childKeys(vdom);
+        if (keys) return diffKeyed(vdom, dom, keys);
         //if dom has extra child
         if (dom.childNodes.length > vdom.childNodes.length) {
             let count = dom.childNodes.length - vdom.childNodes.length;
@@ -0,0 +1,404 @@
+"""
+Process-wide pools the bridge runs its work on, so a burst of browser
+events queues up on a few named, bounded executors instead of starting a
+thread each.
+
+    io         blocking I/O, such as `force_async` functions
+    cpu        CPU-bound work, on worker processes
+    callbacks  Python callbacks called from the browser
+
+Each pool takes `workers` jobs at a time and queues up to `queue` more.
+Past that its `policy` decides: "block" waits for room, "raise" raises
+RejectedError, "caller" runs the job on the submitting thread and
+"discard" returns an already cancelled future. An event loop never waits
+in `submit`, it gets RejectedError instead; code running on a loop awaits
+`asubmit`, which waits for room without holding up the loop.
+
+A thread pool job that waits on something outside the pool, such as a
+callback awaiting a reply from the browser, does so inside `parked()`.
+While it is parked, jobs that would otherwise queue behind it run on a
+spare thread, so callbacks calling back into Python can't starve the pool.
+
+`configure_pool` changes a pool before its next use and `stats` reports
+what every pool did so far.
+"""
+import os
+import atexit
+import pickle
+import asyncio
+import importlib
+from collections import deque
+from contextlib import contextmanager
+from threading import Lock, BoundedSemaphore, Thread, local
+from concurrent.futures import (
+  Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+)
+
+CPUS = os.cpu_count() or 1
+
+POOLS = {
+  "io": {
+    "kind": "thread", "workers": min(32, CPUS + 4), "queue": 1024,
+    "policy": "block",
+  },
+  "cpu": {
+    "kind": "process", "workers": CPUS, "queue": 256, "policy": "block",
+  },
+  "callbacks": {
+    "kind": "thread", "workers": 16, "queue": 512, "policy": "raise",
+  },
+}
+
+POLICIES = ("block", "raise", "caller", "discard")
+
+
+class RejectedError(RuntimeError):
+  """A pool's queue was full and its policy is to refuse more work"""
+
+
+class BoundedExecutor(Executor):
+  """
+  An executor with at most `workers + queue` jobs in flight. The
+  underlying pool is started on first use, and again in a forked child.
+  """
+
+  def __init__(
+    self, name, kind="thread", workers=None, queue=None, policy="block"
+  ):
+    if policy not in POLICIES:
+      raise ValueError(f"Unknown policy {policy!r}, use one of {POLICIES}")
+
+    self.name = name
+    self.kind = kind
+    self.workers = workers or CPUS
+    self.queue = queue
+    self.policy = policy
+
+    self.__lock = Lock()
+    self.__executor = None
+    self.__pid = None
+    self.__slots = (
+      None if queue is None else BoundedSemaphore(self.workers + queue)
+    )
+    # (loop, future) of `asubmit` calls waiting for room
+    self.__waiters = deque()
+    self.__parked = 0
+    self.__spares = 0
+
+    self.submitted = 0
+    self.completed = 0
+    self.failed = 0
+    self.rejected = 0
+    self.pending = 0
+    self.peak = 0
+
+  @property
+  def executor(self):
+    with self.__lock:
+      if self.__pid != os.getpid():
+        self.__pid = os.getpid()
+        if self.kind == "process":
+          self.__executor = ProcessPoolExecutor(self.workers)
+        else:
+          self.__executor = ThreadPoolExecutor(
+            self.workers, thread_name_prefix=f"bridge-{self.name}"
+          )
+      return self.__executor
+
+  @property
+  def stats(self):
+    return {
+      "kind": self.kind,
+      "workers": self.workers,
+      "queue": self.queue,
+      "policy": self.policy,
+      "submitted": self.submitted,
+      "completed": self.completed,
+      "failed": self.failed,
+      "rejected": self.rejected,
+      "pending": self.pending,
+      "peak": self.peak,
+      "parked": self.__parked,
+    }
+
+  def submit(self, fn, *args, **kwargs):
+    block = self.policy == "block" and not on_loop()
+    if self.__slots and not self.__slots.acquire(block):
+      return self.__reject(fn, args, kwargs)
+
+    return self.__start(fn, args, kwargs)
+
+  async def asubmit(self, fn, *args, **kwargs):
+    """
+    `submit` for a running event loop, waits for room under the "block"
+    policy without blocking the loop.
+    """
+    while self.__slots:
+      with self.__lock:
+        if self.__slots.acquire(False):
+          break
+        if self.policy != "block":
+          waiter = None
+        else:
+          loop = asyncio.get_running_loop()
+          waiter = loop.create_future()
+          self.__waiters.append((loop, waiter))
+
+      if waiter is None:
+        return self.__reject(fn, args, kwargs)
+
+      try:
+        await waiter
+      finally:
+        with self.__lock:
+          if (loop, waiter) in self.__waiters:
+            self.__waiters.remove((loop, waiter))
+          elif waiter.cancelled():
+            # woken up, pass the room on to the next one
+            self.__wake()
+
+    return self.__start(fn, args, kwargs)
+
+  def __start(self, fn, args, kwargs):
+    with self.__lock:
+      self.submitted += 1
+      self.pending += 1
+      self.peak = max(self.peak, self.pending)
+      spare = (
+        self.kind == "thread"
+        and self.pending - self.__spares > self.workers
+        and self.__spares < self.__parked
+      )
+      if spare:
+        self.__spares += 1
+
+    try:
+      if spare:
+        future = Future()
+        Thread(
+          target=self.__spare, args=(future, fn, args, kwargs),
+          name=f"bridge-{self.name}-spare", daemon=True,
+        ).start()
+      elif self.kind == "thread":
+        future = self.executor.submit(run_job, self, fn, args, kwargs)
+      else:
+        future = self.executor.submit(fn, *args, **kwargs)
+    except BaseException:
+      if spare:
+        with self.__lock:
+          self.__spares -= 1
+      self.__done(None)
+      raise
+
+    future.add_done_callback(self.__done)
+    return future
+
+  def __spare(self, future, fn, args, kwargs):
+    if not future.set_running_or_notify_cancel():
+      return
+    try:
+      result = run_job(self, fn, args, kwargs)
+    except BaseException as e:
+      error = e
+    else:
+      error = None
+    finally:
+      with self.__lock:
+        self.__spares -= 1
+
+    if error is None:
+      future.set_result(result)
+    else:
+      future.set_exception(error)
+
+  def park(self, count):
+    with self.__lock:
+      self.__parked += count
+
+  def __done(self, future):
+    with self.__lock:
+      self.pending -= 1
+      if future is None or future.cancelled() or future.exception():
+        self.failed += 1
+      else:
+        self.completed += 1
+
+    if self.__slots:
+      with self.__lock:
+        self.__slots.release()
+        self.__wake()
+
+  def __wake(self):
+    while self.__waiters:
+      loop, waiter = self.__waiters.popleft()
+      try:
+        loop.call_soon_threadsafe(self.__woken, waiter)
+        return
+      except RuntimeError:
+        # its loop is closed
+        continue
+
+  def __woken(self, waiter):
+    if not waiter.done():
+      waiter.set_result(None)
+    else:
+      with self.__lock:
+        self.__wake()
+
+  def __reject(self, fn, args, kwargs):
+    with self.__lock:
+      self.rejected += 1
+
+    if self.policy == "block":
+      # only on a running loop, see `submit`
+      raise RejectedError(
+        f"The {self.name} pool is full and an event loop can't wait for "
+        "room, await asubmit instead."
+      )
+
+    if self.policy == "raise":
+      raise RejectedError(f"The {self.name} pool is full.")
+
+    future = Future()
+    if self.policy == "discard":
+      future.cancel()
+      return future
+
+    # "caller"
+    try:
+      future.set_result(fn(*args, **kwargs))
+    except BaseException as e:
+      future.set_exception(e)
+    return future
+
+  def shutdown(self, wait=True, *, cancel_futures=False):
+    with self.__lock:
+      executor, self.__executor, self.__pid = self.__executor, None, None
+    if executor is not None:
+      executor.shutdown(wait, cancel_futures=cancel_futures)
+
+
+__pools = {}
+__pools_lock = Lock()
+
+
+def pool(name) -> BoundedExecutor:
+  """The shared pool `name`, configured by `POOLS[name]`"""
+  with __pools_lock:
+    executor = __pools.get(name)
+    if executor is None:
+      executor = __pools[name] = BoundedExecutor(name, **POOLS.get(name, {}))
+    return executor
+
+
+def configure_pool(name, **options):
+  """
+  Updates `POOLS[name]` with `options` (kind, workers, queue, policy);
+  the running pool, if any, finishes its jobs and is replaced.
+  """
+  with __pools_lock:
+    POOLS[name] = {**POOLS.get(name, {}), **options}
+    executor = __pools.pop(name, None)
+
+  if executor is not None:
+    executor.shutdown(wait=False)
+
+
+def stats():
+  with __pools_lock:
+    return {name: executor.stats for name, executor in __pools.items()}
+
+
+__loops = local()
+# the BoundedExecutor running the current thread's job
+__jobs = local()
+
+
+def on_loop():
+  try:
+    asyncio.get_running_loop()
+  except RuntimeError:
+    return False
+  return True
+
+
+def run_job(executor, fn, args, kwargs):
+  """Runs a job of the thread pool `executor`, see `parked`"""
+  __jobs.executor = executor
+  try:
+    return fn(*args, **kwargs)
+  finally:
+    __jobs.executor = None
+
+
+@contextmanager
+def parked():
+  """
+  Marks the current pool job as waiting on something outside its pool,
+  see the module's docstring. Enter it before asking for what the job
+  waits on, jobs queued before that don't get a spare thread. Does
+  nothing outside a thread pool job.
+  """
+  executor = getattr(__jobs, "executor", None)
+  if executor is None:
+    yield
+    return
+
+  executor.park(1)
+  try:
+    yield
+  finally:
+    executor.park(-1)
+
+
+def run_coroutine(coro):
+  """
+  Runs `coro` to completion on the calling thread's own loop, kept for
+  the next call so pool threads don't set up a loop per job.
+  """
+  loop = getattr(__loops, "loop", None)
+  if loop is None or loop.is_closed():
+    loop = __loops.loop = asyncio.new_event_loop()
+    # closed while its thread is still around, not by the garbage collector
+    atexit.register(loop.close)
+  return loop.run_until_complete(coro)
+
+
+def offload(func, *args, name="cpu"):
+  """
+  Calls `func(*args)` on a worker process of the pool `name` and waits for
+  its result. `func` is looked up by module and name in the worker, so it
+  has to be defined at module level, and `args` have to be picklable.
+  """
+  module = getattr(func, "__module__", None)
+  qualname = getattr(func, "__qualname__", None) or func.__name__
+
+  if not module or not qualname or "<locals>" in qualname:
+    raise TypeError(
+      f"{qualname or func!r} runs in a worker process, it has to be defined "
+      "at module level."
+    )
+
+  for index, arg in enumerate(args):
+    try:
+      pickle.dumps(arg)
+    except Exception as e:
+      raise TypeError(
+        f"Argument {index} of {qualname} ({type(arg).__name__}) can't be sent "
+        f"to a worker process: {e}. Browser objects are proxies, declare the "
+        "fields the callback reads with configure(project=...) instead."
+      ) from None
+
+  return pool(name).submit(call_offloaded, module, qualname, args).result()
+
+
+def call_offloaded(module, qualname, args):
+  """Runs in the worker, see `offload`"""
+  target = importlib.import_module(module)
+  for part in qualname.split("."):
+    target = getattr(target, part)
+
+  result = target(*args)
+  if asyncio.iscoroutine(result):
+    result = asyncio.run(result)
+  return result
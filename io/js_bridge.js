@@ -2265,6 +2265,10 @@
           let _this = this;
 
           this.proxies = new Map();
+          // object -> key, and the counters keys and message ids come from
+          this.proxy_keys = new Map();
+          this.proxy_count = 0;
+          this.message_count = 0;
           this.message_handlers = new Map();
 
           this.formatters = {
@@ -2320,23 +2324,18 @@
           );
         }
 
+        next_id() {
+          return ++this.message_count;
+        }
+
         proxy_object(item) {
-          let key;
-          this.proxies.forEach((value, k) => {
-            try {
-              if (item === value) {
-                key = k;
-                return;
-              }
-            } catch (err) { }
-          });
-          if (key) {
-            return key;
-          } else {
-            key = this.random_id();
+          let key = this.proxy_keys.get(item);
+          if (key === undefined) {
+            key = String(++this.proxy_count);
             this.proxies.set(key, item);
-            return key;
+            this.proxy_keys.set(item, key);
           }
+          return key;
         }
 
         generate_proxy(item) {
@@ -2463,7 +2462,7 @@
         recieve(message = null) {
           let _this = this;
           return new Promise((resolve, reject) => {
-            let message_id = _this.random_id();
+            let message_id = _this.next_id();
 
             if (message) {
               message.message_id = message_id
@@ -2778,10 +2777,36 @@
       const util = require("util")
 
 
+      class Projection {
+        // the fields of `target` a callback asked for, sent inline with it
+        constructor(target, paths) {
+          this.target = target;
+          this.fields = {};
+
+          for (let path of paths) {
+            let value = target;
+            for (let key of path.split(".")) {
+              if (value === null || value === undefined) break;
+              value = value[key];
+            }
+
+            // anything else is left for the proxy to fetch
+            if (
+              value === null || value === undefined ||
+              ["string", "number", "boolean"].includes(typeof value)
+            ) {
+              this.fields[path] = value === undefined ? null : value;
+            }
+          }
+        }
+      }
+
+
       class JSBridgeClient extends BaseHandler {
         constructor(options) {
           super()
           this.options = options || {};
+          this.limits = {};
         }
 
         start() {
@@ -2817,6 +2842,75 @@
           })
         }
 
+        limit(func, options, ...args) {
+          // exec, rate controlled by configure(debounce=, throttle=, latest=, frame=)
+          let state = this.limits[func];
+          if (!state) {
+            state = this.limits[func] = {
+              pending: null, dropped: 0, last: 0,
+              timer: null, frame: false, busy: false
+            };
+          }
+
+          // an event still waiting is replaced by the newer one
+          if (state.pending) state.dropped++;
+          state.pending = args;
+
+          let release = () => {
+            if (!state.pending || (options.latest && state.busy)) return;
+
+            let call = this.recieve({
+              action: "exec",
+              target: func,
+              args: state.pending,
+              dropped: state.dropped
+            });
+            state.pending = null;
+            state.dropped = 0;
+            state.last = Date.now();
+
+            if (options.latest) {
+              state.busy = true;
+              Promise.resolve(call).finally(() => {
+                state.busy = false;
+                release();
+              });
+            }
+            return call;
+          };
+
+          if (options.debounce) {
+            clearTimeout(state.timer);
+            state.timer = setTimeout(release, options.debounce);
+          } else if (options.throttle) {
+            let wait = options.throttle - (Date.now() - state.last);
+            if (wait <= 0 && !state.timer) {
+              release();
+            } else if (!state.timer) {
+              state.timer = setTimeout(() => {
+                state.timer = null;
+                release();
+              }, wait);
+            }
+          } else if (options.frame) {
+            if (!state.frame) {
+              state.frame = true;
+              let next = typeof requestAnimationFrame == "function" ?
+                requestAnimationFrame : (callback) => setTimeout(callback, 16);
+              next(() => {
+                state.frame = false;
+                release();
+              });
+            }
+          } else {
+            release();
+          }
+        }
+
+        project(target, paths) {
+          return new Projection(target, paths);
+        }
+
         format_arg(value) {
           let location;
           let value_type = typeof value;
@@ -2825,6 +2919,11 @@
             return null
           }
 
+          if (value instanceof Projection) {
+            location = this.proxy_object(value.target);
+            return { type: "bridge_proxy", obj_type: "projection", location: location, fields: value.fields };
+          }
+
           if (value_type == "function" && String(value) == "__JsBridgeProxyObject__") {
             return { type: "bridge_proxy", obj_type: "reverse_proxy", location: String(value.__data__.location), reverse: true };
           }
@@ -3255,6 +3354,90 @@
         return temp;
       }
 
+      function nodeAtPath(path, root) {
+        var node = root || document.documentElement;
+        for (var index of path) {
+          node = node?.children[index];
+        }
+        return node || null;
+      }
+
+      function childKeys(node) {
+        return Array.prototype.map.call(
+          node.children, (child) => child.getAttribute("key")
+        );
+      }
+
+      function reconcileKeyed(node, operations) {
+        var byKey = new Map();
+
+        for (var child of Array.from(node.children)) {
+          var key = child.getAttribute("key");
+          /* unkeyed children can't be matched, so they don't survive */
+          if (key === null) {
+            child.remove();
+          } else {
+            byKey.set(key, child);
+          }
+        }
+
+        for (var [action, key, before, html] of operations) {
+          var anchor = (before === null || before === undefined) ? null : byKey.get(String(before)) || null;
+          key = String(key);
+
+          if (action == "remove") {
+            byKey.get(key)?.remove();
+            byKey.delete(key);
+          } else if (action == "move") {
+            node.insertBefore(byKey.get(key), anchor);
+          } else if (action == "insert") {
+            var template = document.createElement("template");
+            template.innerHTML = html.trim();
+            clean(template.content);
+
+            var created = template.content.firstElementChild;
+            byKey.set(key, created);
+            node.insertBefore(created, anchor);
+          } else if (action == "update") {
+            var current = byKey.get(key);
+            var template = document.createElement("template");
+            template.innerHTML = html.trim();
+            clean(template.content);
+
+            var updated = template.content.firstElementChild;
+            if (current && updated) {
+              byKey.set(key, morph(current, updated));
+            }
+          }
+        }
+      }
+
+      /* brings `node` up to date with `updated`, keeping it if it can */
+      function morph(node, updated) {
+        if (node.isEqualNode(updated)) {
+          return node;
+        }
+        if (node.nodeName !== updated.nodeName) {
+          node.replaceWith(updated);
+          return updated;
+        }
+
+        for (var attr of Array.from(node.attributes)) {
+          if (!updated.hasAttribute(attr.name)) {
+            node.removeAttribute(attr.name);
+          }
+        }
+        for (var attr of Array.from(updated.attributes)) {
+          if (node.getAttribute(attr.name) !== attr.value) {
+            node.setAttribute(attr.name, attr.value);
+          }
+        }
+        if (node.innerHTML !== updated.innerHTML) {
+          node.replaceChildren(...updated.childNodes);
+        }
+        return node;
+      }
+
       module.exports = {
         JSBridge,
         ...clients,
@@ -3262,6 +3445,9 @@
         evalXpath,
         cleanDom: clean,
         generateXpath,
+        nodeAtPath,
+        childKeys,
+        reconcileKeyed,
         ...proxies,
         ...conns,
         ...transporters,
@@ -3920,6 +4106,24 @@
           (function () {
             const fs = require("fs");
 
+            // short names of the envelope keys, shared with pybridge.py
+            const ENVELOPE_KEYS = {
+              action: "a", message_id: "i", conn_id: "c", response: "r",
+              value: "v", error: "e", location: "l", stack: "s", target: "t",
+              args: "g", kwargs: "k"
+            };
+            const ENVELOPE_NAMES = Object.fromEntries(
+              Object.entries(ENVELOPE_KEYS).map(([name, key]) => [key, name])
+            );
+
+            function renameKeys(data, names) {
+              let ret = {};
+              for (let key in data) {
+                ret[names[key] || key] = data[key];
+              }
+              return ret;
+            }
+
             class BaseBridgeTransporter {
 
               start(on_message, server) {
@@ -3931,7 +4135,14 @@
               setup() { }
 
               decode(data, raw = false) {
-                return (!raw) ? JSON.parse(data, this.bridge.decoder.bind(this.bridge)) : JSON.parse(data)
+                let bridge = this.bridge;
+                // compact envelopes are expanded before the bridge sees them
+                return JSON.parse(data, function (key, value) {
+                  if (key === "" && value && value.constructor === Object) {
+                    value = renameKeys(value, ENVELOPE_NAMES);
+                  }
+                  return raw ? value : bridge.decoder(key, value);
+                })
               }
 
               encode(data, raw = false) {
@@ -3943,7 +4154,20 @@
                 }
                 //  console.log("[JS] Encoding2:", data, raw)
 
-                let ret = (!raw) ? JSON.stringify(data, this.bridge.encoder.bind(this.bridge)) : JSON.stringify(data)
+                let ret;
+                if (this.compact) {
+                  // the bridge's encoder still sees the full key names
+                  let bridge = this.bridge, envelope = null;
+                  ret = JSON.stringify(data, function (key, value) {
+                    if (key === "" && !envelope) {
+                      return envelope = renameKeys(value, ENVELOPE_KEYS);
+                    }
+                    if (raw) return value;
+                    return bridge.encoder(this === envelope && ENVELOPE_NAMES[key] || key, value);
+                  })
+                } else {
+                  ret = (!raw) ? JSON.stringify(data, this.bridge.encoder.bind(this.bridge)) : JSON.stringify(data)
+                }
 
                 if (objToJSON) {
                   data.response.toJSON = objToJSON;
@@ -3965,11 +4189,19 @@
                 this.host = options.host || "localhost";
                 this.port = options.port || 7001;
                 this.path = options.path || "/"
+                // the server offered compact envelopes, say we use them too
+                this.compact = !!options.compact;
+
+                // wss behind TLS, wherever it ends
+                this.scheme = options.secure ? "wss" : "ws";
 
                 this.socket = new WebSocket(
-                  `ws://${this.host}:${this.port}${this.path}`
+                  `${this.scheme}://${this.host}:${this.port}${this.path}`
                 )
                 this.socket.addEventListener("open", () => {
+                  if (this.compact) {
+                    this.socket.send(";[::];" + JSON.stringify({ a: "hello", c: options.conn_id }));
+                  }
                   for (let item of this.sendQ) {
                     this.socket.send(item);
                   }
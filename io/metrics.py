@@ -0,0 +1,197 @@
+"""
+Instrumentation of the bridge: latency histograms per action, messages
+and bytes in each direction, calls still waiting on the browser per
+connection, and gauges read whenever a snapshot is taken.
+
+Latencies are kept by kind:
+
+    browser  the server waiting on the browser, `recieve` round trips
+    python   the server handling the browser's commands, `process_command`
+
+`Metrics.snapshot()` returns all of it as plain data, `prometheus()` as
+Prometheus' text format (see `BridgeIO.expose_metrics`).
+"""
+import time
+from bisect import bisect_left
+from threading import Lock
+
+
+class Histogram:
+  """
+  Log-linear buckets in the manner of HDR histograms: every power of two
+  from `lowest` to `highest` is split in `precision` equal buckets, so
+  percentiles stay within 1/precision of the real value with a fixed,
+  small number of counters.
+  """
+
+  def __init__(self, lowest=1e-6, highest=600.0, precision=4):
+    self.precision = precision
+    self.bounds = []
+
+    power = lowest
+    while power < highest:
+      for step in range(1, precision + 1):
+        self.bounds.append(power * (1 + step / precision))
+      power *= 2
+
+    self.counts = [0] * (len(self.bounds) + 1)
+    self.count = 0
+    self.sum = 0.0
+    self.max = 0.0
+    self.__lock = Lock()
+
+  def observe(self, value):
+    index = bisect_left(self.bounds, value)
+    with self.__lock:
+      self.counts[index] += 1
+      self.count += 1
+      self.sum += value
+      if value > self.max:
+        self.max = value
+
+  def percentile(self, q):
+    if not self.count:
+      return 0.0
+
+    rank = q / 100 * self.count
+    seen = 0
+    for index, count in enumerate(self.counts):
+      seen += count
+      if seen >= rank and count:
+        if index == len(self.bounds):
+          return self.max
+        return min(self.bounds[index], self.max)
+    return self.max
+
+  def snapshot(self):
+    return {
+      "count": self.count,
+      "sum": self.sum,
+      "mean": self.sum / self.count if self.count else 0.0,
+      "p50": self.percentile(50),
+      "p90": self.percentile(90),
+      "p99": self.percentile(99),
+      "max": self.max,
+    }
+
+  def buckets(self):
+    """Cumulative (upper bound, count) pairs at every power of two"""
+    pairs = []
+    seen = 0
+    for index, count in enumerate(self.counts[:-1]):
+      seen += count
+      if (index + 1) % self.precision == 0:
+        pairs.append((self.bounds[index], seen))
+    pairs.append((float("inf"), self.count))
+    return pairs
+
+
+class Metrics:
+  COUNTERS = {
+    "messages_in": "Messages received from browsers",
+    "messages_out": "Messages sent to browsers",
+    "bytes_in": "Bytes received from browsers",
+    "bytes_out": "Bytes sent to browsers",
+    "errors": "Browser commands that raised",
+  }
+
+  def __init__(self):
+    self.__lock = Lock()
+    # (kind, action) -> Histogram
+    self.latency = {}
+    self.counters = dict.fromkeys(self.COUNTERS, 0)
+    # conn_id -> calls waiting on the browser
+    self.in_flight = {}
+    # name -> (help, label, function)
+    self.gauges = {}
+
+    self.gauge(
+      "in_flight", lambda: sum(self.in_flight.values()),
+      "Calls waiting on a browser"
+    )
+
+  def count(self, name, amount=1):
+    with self.__lock:
+      self.counters[name] = self.counters.get(name, 0) + amount
+
+  def observe(self, kind, action, seconds):
+    histogram = self.latency.get((kind, action))
+    if histogram is None:
+      with self.__lock:
+        histogram = self.latency.setdefault((kind, action), Histogram())
+    histogram.observe(seconds)
+
+  def begin(self, conn_id):
+    """Marks a call to `conn_id`'s browser as started, see `end`"""
+    with self.__lock:
+      self.in_flight[conn_id] = self.in_flight.get(conn_id, 0) + 1
+    return time.perf_counter()
+
+  def end(self, conn_id, action, started):
+    with self.__lock:
+      waiting = self.in_flight.get(conn_id, 1) - 1
+      if waiting:
+        self.in_flight[conn_id] = waiting
+      else:
+        self.in_flight.pop(conn_id, None)
+    self.observe("browser", action, time.perf_counter() - started)
+
+  def gauge(self, name, function, help="", label=None):
+    """
+    Reports `function()` as `name` in every snapshot. With `label` the
+    function returns a {label value: value} dict instead of a number.
+    """
+    self.gauges[name] = (help, label, function)
+
+  def snapshot(self):
+    latency = {}
+    for (kind, action), histogram in list(self.latency.items()):
+      latency.setdefault(kind, {})[action] = histogram.snapshot()
+
+    with self.__lock:
+      counters = dict(self.counters)
+      in_flight = dict(self.in_flight)
+
+    return {
+      "latency": latency,
+      "counters": counters,
+      "in_flight": in_flight,
+      "gauges": {
+        name: function() for name, (_, _, function) in self.gauges.items()
+      },
+    }
+
+  def prometheus(self, prefix="bridgeio"):
+    lines = []
+
+    name = f"{prefix}_latency_seconds"
+    lines.append(f"# HELP {name} Bridge call latency by kind and action")
+    lines.append(f"# TYPE {name} histogram")
+    for (kind, action), histogram in sorted(self.latency.items()):
+      labels = f'kind="{kind}",action="{action}"'
+      for bound, count in histogram.buckets():
+        le = "+Inf" if bound == float("inf") else repr(bound)
+        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {count}')
+      lines.append(f"{name}_sum{{{labels}}} {histogram.sum!r}")
+      lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+    with self.__lock:
+      counters = dict(self.counters)
+    for counter, value in counters.items():
+      name = f"{prefix}_{counter}_total"
+      lines.append(f"# HELP {name} {self.COUNTERS.get(counter, counter)}")
+      lines.append(f"# TYPE {name} counter")
+      lines.append(f"{name} {value}")
+
+    for gauge, (help, label, function) in self.gauges.items():
+      name = f"{prefix}_{gauge}"
+      lines.append(f"# HELP {name} {help or gauge}")
+      lines.append(f"# TYPE {name} gauge")
+      value = function()
+      if label:
+        for key, item in sorted(value.items()):
+          lines.append(f'{name}{{{label}="{key}"}} {item}')
+      else:
+        lines.append(f"{name} {value}")
+
+    return "\n".join(lines) + "\n"
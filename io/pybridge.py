@@ -1,32 +1,81 @@
 import os
 import sys
 import json
+import time
 import queue
 import asyncio
+import weakref
 import builtins
 import traceback
 from pathlib import Path
+from hashlib import sha256
 from types import NoneType
 from random import randint
-from functools import wraps
+from itertools import count
+from collections import deque
+from functools import wraps, cache
 from multiprocessing import Process
-from threading import Thread, RLock, Event
+from threading import Thread, RLock, Event, current_thread
+from contextvars import ContextVar
 from inspect import getfullargspec, iscoroutinefunction, iscoroutine
 
+from .executors import pool, parked, offload, run_coroutine, RejectedError
+from .executors import stats as pool_stats
+from .metrics import Metrics
+from .recording import Recording
+from .tracing import record as trace_operation, traced
+
 UNDEFINED = object()
 DEBUG = False
 
-with open((Path(__file__).parent / "js_bridge.js").as_posix()) as f:
-    BridgeJS = f.read()
+# set inside calls scheduled by `run_deferred`
+DEFERRED = ContextVar("DEFERRED", default=False)
+
+try:
+    from rjsmin import jsmin
+except ImportError:
+    jsmin = None
+
+
+@cache
+def bridge_js():
+    """
+    js_bridge.js, the build browsers get (minified when `rjsmin` is
+    installed) and the build's hash. Read on first use, not on import.
+    """
+    with open((Path(__file__).parent / "js_bridge.js").as_posix()) as f:
+        source = f.read()
+
+    build = jsmin(source) if jsmin else source
+    return source, build, sha256(build.encode()).hexdigest()[:16]
 
-INJECTED_SCRIPT_SRC = "/__web_route_js__"
+
+def injected_script_src():
+    # content addressed, so it can be cached for good
+    return f"/__web_route_js__/{bridge_js()[2]}.js"
+
+
+def __getattr__(name):
+    # the module's constants from before the bridge was read lazily
+    names = ("BridgeJS", "BridgeJSBuild", "BridgeJSHash")
+    if name in names:
+        return bridge_js()[names.index(name)]
+    if name == "INJECTED_SCRIPT_SRC":
+        return injected_script_src()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# a fresh connection's bootstrap, for pages that can't carry it inline
+CONNECT_SCRIPT_SRC = "/__web_route_connect__"
 
 INJECTED_SCRIPT = """
 const client = new JSBridge.JSBridgeClient({{
     host: location.hostname,
-    port: location.port || 80,
+    port: location.port || (location.protocol === "https:" ? 443 : 80),
+    secure: location.protocol === "https:",
     path: "/__web_route_ws__/{0}",
     conn_id: "{0}",
+    compact: true,
     reconnect: false,
     debug: false
 }});
@@ -45,16 +94,23 @@ def get_event_loop():
 
 def force_async(fn):
     """
-    Turns a sync function to async function using threads
+    Turns a sync function to async function using the shared io pool
     """
-    from concurrent.futures import ThreadPoolExecutor
-
-    pool = ThreadPoolExecutor()
 
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        future = pool.submit(fn, *args, **kwargs)
-        return asyncio.wrap_future(future)  # make it awaitable
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            future = pool("io").submit(fn, *args, **kwargs)
+            return asyncio.wrap_future(future)  # make it awaitable
+
+        # waits for room in the pool without holding up the loop
+        async def submit():
+            future = await pool("io").asubmit(fn, *args, **kwargs)
+            return await asyncio.wrap_future(future)
+
+        return asyncio.ensure_future(submit())
 
     return wrapper
 
@@ -78,24 +134,144 @@ def run_safe(func, *args, **kwargs):
     return get_event_loop().call_soon(func, *args, **kwargs)
 
 
-def run_sync(func):
-    def wrapper(*a, **kw):
-        res = func(*a, **kw)
+def resolve_future(future, result):
+    if not future.done():
+        future.set_result(result)
 
-        if iscoroutine(res):
+
+def reject_future(future, error):
+    if not future.done():
+        future.set_exception(error)
+
+
+def resolve_threadsafe(loop, future, result):
+    try:
+        loop.call_soon_threadsafe(resolve_future, future, result)
+    except RuntimeError:
+        # the waiting loop was closed, nobody is left to resolve it for
+        pass
+
+
+class Portal:
+    """
+    A long-lived event loop on a daemon thread that sync code hands its
+    coroutines to, instead of starting a thread and a loop for each call.
+    Started on first use, and again in a forked child.
+    """
+
+    def __init__(self):
+        self.__lock = RLock()
+        self.__loop = None
+        self.__thread = None
+        self.__pid = None
+        # the loops connections are served on, see `serve`
+        self.__serving = weakref.WeakSet()
+
+    @property
+    def loop(self):
+        with self.__lock:
+            if self.__pid != os.getpid():
+                self.__pid = os.getpid()
+                self.__loop = asyncio.new_event_loop()
+                self.__thread = Thread(
+                    target=self.__loop.run_forever, name="bridge-portal",
+                    daemon=True
+                )
+                self.__thread.start()
+            return self.__loop
+
+    def serve(self, loop):
+        """
+        Marks `loop` as one the browsers' replies are read on: blocking it
+        on a bridge call would wait for a reply it can't deliver anymore.
+        """
+        self.__serving.add(loop)
+
+    def inside(self):
+        """Whether the caller runs on the portal's own thread"""
+        return self.__thread is not None and current_thread() is self.__thread
+
+    def call(self, coro):
+        """
+        Runs `coro` on the portal and blocks until it's done. Refused on a
+        loop connections are served on, see `serve`.
+        """
+        if self.inside():
+            # blocking the portal on itself would never return, give the
+            # nested call a loop of its own instead
             q = queue.Queue()
 
             @async_daemon_task
             async def _():
-                q.put(await res)
+                try:
+                    q.put((True, await coro))
+                except BaseException as e:
+                    q.put((False, e))
 
             _()
-            res = q.get()
+            ok, result = q.get()
+            if not ok:
+                raise result
+            return result
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop in self.__serving:
+            # frozen until the call returns, it couldn't read the reply
+            coro.close()
+            raise RuntimeError(
+                "Can't block on a bridge call from a running event loop, "
+                "await it instead."
+            )
+
+        # a callback blocked here waits on the browser, not on its pool
+        with parked():
+            return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+PORTAL = Portal()
+
+
+def run_sync(func):
+    def wrapper(*a, **kw):
+        res = func(*a, **kw)
+
+        if iscoroutine(res):
+            res = PORTAL.call(res)
         return res
 
     return wrapper
 
 
+def run_deferred(connection, func):
+    """
+    `run_sync` for calls nobody waits on, such as setting an attribute.
+    On the loop serving the connection's socket, blocking would stop the
+    reply from ever being read, so the call is scheduled there instead and
+    settled before the connection's next request.
+    """
+
+    def wrapper(*a, **kw):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is None or loop is not getattr(connection, "__loop__", None):
+            return run_sync(func)(*a, **kw)
+
+        async def deferred():
+            DEFERRED.set(True)
+            return await func(*a, **kw)
+
+        return connection.__defer__(loop.create_task(deferred()))
+
+    return wrapper
+
+
 class cached_property(object):
     """A property that is only computed once per instance and then replaces
     itself with an ordinary attribute. Deleting the attribute resets the
@@ -172,6 +348,8 @@ def get_encoder(server):
                     "stack": getattr(obj, "#callstack"),
                     "reverse": True,
                 }
+            if isinstance(obj, Settled):
+                return obj.__settled__()
             # if isinstance(obj, tuple):
             #     return server.generate_proxy(obj)
 
@@ -254,6 +432,24 @@ def generate_random_id(size=20):
     return "".join([str(randint(0, 9)) for i in range(size)])
 
 
+# short names of the envelope keys, shared with js_bridge.js. The browser
+# offers them with a "hello" and both sides accept either form.
+ENVELOPE_KEYS = {
+    "action": "a", "message_id": "i", "conn_id": "c", "response": "r",
+    "value": "v", "error": "e", "location": "l", "stack": "s", "target": "t",
+    "args": "g", "kwargs": "k",
+}
+ENVELOPE_NAMES = {key: name for name, key in ENVELOPE_KEYS.items()}
+
+
+def compact_envelope(message):
+    return {ENVELOPE_KEYS.get(key, key): value for key, value in message.items()}
+
+
+def expand_envelope(message):
+    return {ENVELOPE_NAMES.get(key, key): value for key, value in message.items()}
+
+
 class ThreadSafeWrapper:
     def __init__(self, target):
         self.__target = target
@@ -408,6 +604,167 @@ class BridgeProxy:
         )
 
 
+class Settled:
+    """
+    A projected field's value. It is the value itself, and awaiting it
+    gives the plain value back, as awaiting the proxy it stands in for
+    did: `event.key == "Enter"` and `await event.key` both work.
+    """
+
+    __slots__ = ()
+
+    def __await__(self):
+        yield from ()
+        return self.__settled__()
+
+    def __reduce__(self):
+        value = self.__settled__()
+        return (type(value), (value,))
+
+
+class SettledStr(Settled, str):
+    __slots__ = ()
+
+    def __settled__(self):
+        return str(self)
+
+
+class SettledInt(Settled, int):
+    __slots__ = ()
+
+    def __settled__(self):
+        return int(self)
+
+
+class SettledFloat(Settled, float):
+    __slots__ = ()
+
+    def __settled__(self):
+        return float(self)
+
+
+class SettledList(Settled, list):
+    __slots__ = ()
+
+    def __settled__(self):
+        return list(self)
+
+
+class SettledDict(Settled, dict):
+    __slots__ = ()
+
+    def __settled__(self):
+        return dict(self)
+
+
+class SettledValue(Settled):
+    """
+    The values whose type can't be subclassed, booleans and None mostly.
+    They compare, hash and convert as their value does, but aren't it:
+    `is True` or `is None` checks need `await` first.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __settled__(self):
+        return self.value
+
+    def __reduce__(self):
+        return (SettledValue, (self.value,))
+
+    def __getattr__(self, name):
+        return getattr(self.value, name)
+
+    def __bool__(self):
+        return bool(self.value)
+
+    def __eq__(self, other):
+        if isinstance(other, SettledValue):
+            other = other.value
+        return self.value == other
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __int__(self):
+        return int(self.value)
+
+    def __str__(self):
+        return str(self.value)
+
+    def __repr__(self):
+        return repr(self.value)
+
+
+SETTLED = {
+    str: SettledStr, int: SettledInt, float: SettledFloat,
+    list: SettledList, dict: SettledDict,
+}
+
+
+def settled(value):
+    """`value` as a projected field, see `Settled`"""
+    return SETTLED.get(type(value), SettledValue)(value)
+
+
+class Projection:
+    """
+    An object the browser sent along with the fields a callback declared it
+    needs (see `ui.configure(project=...)`). Projected fields are their
+    values, which can be awaited as well (see `Settled`), so handlers that
+    awaited the proxy keep working. Anything else is read through the proxy
+    of the original object. Pickled, only the projected fields are kept.
+    """
+
+    def __init__(self, fields, proxy, prefix=""):
+        object.__setattr__(self, "_Projection__fields", fields)
+        object.__setattr__(self, "_Projection__proxy", proxy)
+        object.__setattr__(self, "_Projection__prefix", prefix)
+
+    @property
+    def __proxy__(self):
+        return self.__proxy
+
+    def __reduce__(self):
+        return (Projection, (self.__fields, None, self.__prefix))
+
+    def __getattr__(self, name):
+        path = self.__prefix + str(name)
+
+        if path in self.__fields:
+            return settled(self.__fields[path])
+
+        proxy = self.__proxy
+        if any(key.startswith(path + ".") for key in self.__fields):
+            return Projection(
+                self.__fields, None if proxy is None else proxy[name], path + "."
+            )
+
+        if proxy is None:
+            raise AttributeError(
+                f"{path} wasn't projected, only {list(self.__fields)} were sent"
+            )
+        return proxy[name]
+
+    def __getitem__(self, name):
+        return self.__getattr__(name)
+
+    def __setattr__(self, name, value):
+        self.__proxy[name] = value
+
+    def __setitem__(self, name, value):
+        self.__proxy[name] = value
+
+    def __await__(self):
+        return self.__proxy.__await__()
+
+    def __repr__(self):
+        return f"Projection({self.__fields})"
+
+
 class AsyncProxyIntermediate:
     def __init__(self, callstack, data):
         setattr(self, "#callstack", [*callstack])
@@ -428,7 +785,8 @@ class AsyncProxyIntermediate:
         if name in ["#callstack", "#data"]:
             return super().__setattr__(name, value)
 
-        return run_sync(self.__set__)(name, value)
+        connection = getattr(self, "#data")["__server__"]
+        return run_deferred(connection, self.__set__)(name, value)
 
     def __set__(self, name, value=UNDEFINED):
         data = getattr(self, "#data")
@@ -512,7 +870,7 @@ class AsyncBridgeProxy(BridgeProxy):
     def __setattr__(self, name, value):
         if name in ["__server__", "__data__"]:
             return super().__setattr__(name, value)
-        return run_sync(self.__set__)(name, value)
+        return run_deferred(self.__server__, self.__set__)(name, value)
 
     def __set__(self, name, value):
         return self.__server__.__recieve__(
@@ -552,6 +910,8 @@ class BridgeConnection:
         self.__mode = mode
         self.__require = None
         self.__server__ = server
+        # built once, decoding a message shouldn't create a class
+        self.__decoder__ = get_decoder(self)
 
     def __getattr__(self, name):
         if name == "let" or name == "var":
@@ -621,6 +981,12 @@ class MultiBridgeConnection(BridgeConnection):
         super().__init__(*a, **kw)
         self.__conn_id__ = conn_id
         self.__socket__ = socket
+        # ids of the messages sent on this connection
+        self.__ids__ = count(1)
+        # set once the browser said it reads compact envelopes
+        self.__compact__ = False
+        # the Recording of this connection's frames, see `AsyncMultiServer.record`
+        self.__recording__ = None
         self.__queue__ = ThreadSafeQueue()
         self.__context__ = dict()
         self.__event__ = Event()
@@ -636,11 +1002,18 @@ class MultiBridgeConnection(BridgeConnection):
             if is_proxy and data.get("location", UNDEFINED) != UNDEFINED:
                 if data.get("reverse"):
                     return self.__server__.handle_get_stack_attribute(data, self)
+                if data.get("obj_type") == "projection":
+                    fields = data.pop("fields", None) or {}
+                    return Projection(fields, self.__server__.proxy(self, data))
                 return self.__server__.proxy(self, data)
         return data
 
     def __send__(self, **kw):
+        if self.__compact__:
+            kw = compact_envelope(kw)
         data = self.__server__.encode(kw)
+        self.__server__.metrics.count("messages_out")
+        self.__server__.metrics.count("bytes_out", len(data))
         force_sync(self.__socket__.send)(data)
         if DEBUG:
             print("[PY] Sent:", data)
@@ -677,6 +1050,22 @@ class AsyncMultiBridgeConnection(MultiBridgeConnection):
     def __init__(self, *a, **kw):
         super().__init__(*a, **kw)
         self.__queue__ = ThreadSafeQueue()
+        self.__loop__ = get_event_loop()
+        self.__deferred__ = []
+        PORTAL.serve(self.__loop__)
+
+    def __defer__(self, task):
+        self.__deferred__.append(task)
+        return task
+
+    async def __settle__(self):
+        """Waits for the deferred calls scheduled on the current loop"""
+        loop = asyncio.get_running_loop()
+        self.__deferred__ = [task for task in self.__deferred__ if not task.done()]
+
+        pending = [task for task in self.__deferred__ if task.get_loop() is loop]
+        if pending:
+            await asyncio.gather(*pending)
 
     async def require(self, scriptSrc):
         promise = await super().__recieve__(action="import_script", script=scriptSrc)
@@ -691,8 +1080,14 @@ class AsyncMultiBridgeConnection(MultiBridgeConnection):
         pass
 
     async def __send__(self, **kw):
-        data = self.__server__.encode(kw)
-        await self.__socket__.send(data + ";[::];")
+        if self.__compact__:
+            kw = compact_envelope(kw)
+        data = self.__server__.encode(kw) + ";[::];"
+        self.__server__.metrics.count("messages_out")
+        self.__server__.metrics.count("bytes_out", len(data))
+        if self.__recording__ is not None:
+            self.__recording__.add("out", data)
+        await self.__socket__.send(data)
         if DEBUG:
             print("[PY] Sent:", data)
         return None
@@ -747,8 +1142,24 @@ class BaseHandler:
         self.timeout = 5
 
         self.message_handlers = dict()
+        self.message_ids = count(1)
+        # id(object) -> key, objects are kept alive by `proxies`
+        self.proxy_keys = dict()
+        self.proxy_ids = count(1)
         self.exec_context = {}
 
+        self.metrics = Metrics()
+        self.metrics.gauge(
+            "proxies", lambda: len(self.proxies), "Objects proxied to browsers"
+        )
+        self.metrics.gauge(
+            "pending_replies", lambda: len(self.message_handlers),
+            "Replies the server is waiting for"
+        )
+        # callback name -> events delivered, and dropped by the browser's
+        # rate control before they were sent
+        self.callback_stats = {}
+
         self.encoder = get_encoder(self)
         self.decoder = get_decoder(self)
 
@@ -770,15 +1181,11 @@ class BaseHandler:
         return generate_random_id(size)
 
     def proxy_object(self, arg):
-        for k, v in self.proxies.items():
-            try:
-                if v == arg:
-                    return k
-            except Exception:
-                continue
-
-        key = generate_random_id(15) + str(id(arg))
-        self.proxies[key] = arg
+        key = self.proxy_keys.get(id(arg))
+        if key is None or self.proxies.get(key) is not arg:
+            key = str(next(self.proxy_ids))
+            self.proxies[key] = arg
+            self.proxy_keys[id(arg)] = key
         return key
 
     def generate_proxy(self, arg):
@@ -808,7 +1215,7 @@ class BaseHandler:
         self.transporter.send(data, raw)
 
     def recieve(self, **data):
-        mid = generate_random_id()
+        mid = next(self.message_ids)
         data["message_id"] = mid
 
         q = queue.SimpleQueue()
@@ -827,9 +1234,14 @@ class BaseHandler:
                 q.put(message)
 
         self.message_handlers[mid] = handler
-        self.send(**data)
+        started = time.perf_counter()
 
-        response = q.get(timeout=self.timeout)
+        try:
+            with parked():
+                self.send(**data)
+                response = q.get(timeout=self.timeout)
+        finally:
+            trace_operation(data, started)
         # self.queue.task_done()
         if isinstance(response, Exception):
             raise response
@@ -844,11 +1256,17 @@ class BaseHandler:
         if not func:
             raise Exception("Invalid action.")
 
+        started = time.perf_counter()
         try:
             ret = func(req, handler)
             return {"response": ret}
         except Exception as e:
+            self.metrics.count("errors")
             return {"error": "\n".join(traceback.format_exception(e))}
+        finally:
+            self.metrics.observe(
+                "python", req["action"], time.perf_counter() - started
+            )
 
     def handle_evaluate(self, req, handler=None):
         target = getattr(builtins, req["value"], UNDEFINED)
@@ -858,8 +1276,21 @@ class BaseHandler:
         target = request.get("target")
         args = request.get("args") or []
         if target:
-            func = self.exec_context.get(target)
+            stats = self.callback_stats.setdefault(
+                target, {"delivered": 0, "dropped": 0}
+            )
+            stats["delivered"] += 1
+            stats["dropped"] += request.get("dropped") or 0
+
+            func = self.get_callback(target, handler)
             if func:
+                if getattr(func, "__offload__", None) == "process":
+                    return offload(func, *args)
+                budgets = getattr(func, "__trace__", None)
+                if budgets:
+                    func = traced(
+                        func, target, budgets if isinstance(budgets, dict) else None
+                    )
                 if apply:
                     func = apply(func)
 
@@ -867,6 +1298,9 @@ class BaseHandler:
                 return ret
         return
 
+    def get_callback(self, target, handler=None):
+        return self.exec_context.get(target)
+
     def handle_evaluate_stack_attribute(self, req, handler):
         stack = req["stack"]
         ret = handler.__context__.get(stack[0]) or getattr(builtins, stack[0], None)
@@ -922,8 +1356,7 @@ class BaseHandler:
         if not isolate:
             return ret(*args, **kwargs)
         else:
-            t = Thread(target=ret, args=args, kwargs=kwargs, daemon=True)
-            t.start()
+            pool("callbacks").submit(ret, *args, **kwargs)
             return True
 
     def __format_kwargs(self, data):
@@ -1162,7 +1595,7 @@ class BridgeServer(BaseHandler):
             json.loads(data)
             if raw
             else json.loads(
-                data, cls=(self.decoder if not handler else get_decoder(handler))
+                data, cls=(self.decoder if not handler else handler.__decoder__)
             )
         )
 
@@ -1200,16 +1633,29 @@ class MultiServer(BridgeServer):
         self.handlers[conn_id] = handler
         self.conn_queues.put(conn_id)
 
-        @daemon_task
-        def _(message):
-            self.on_message(self.decode(message, handler))
-
         while self.is_listening.is_set() and handler.__event__.is_set():
             msg = force_sync(socket.receive)()
             if DEBUG:
                 print("[PY] Recieved: ", msg)
-            if msg:
-                _(msg)
+            if not msg:
+                continue
+
+            message = self.decode(msg, handler)
+            if isinstance(message, dict):
+                message = expand_envelope(message)
+                if message.get("action") == "hello":
+                    handler.__compact__ = True
+                    continue
+
+            if not (isinstance(message, dict) and "action" in message):
+                # replies only wake up their caller
+                self.on_message(message)
+                continue
+
+            try:
+                pool("callbacks").submit(self.on_message, message)
+            except RejectedError as e:
+                self.send(error=str(e), message_id=message.get("message_id"))
 
         self.handlers.pop(conn_id)
         del handler
@@ -1237,14 +1683,14 @@ class MultiServer(BridgeServer):
             return handler.__send__(**kw)
 
     def recieve(self, conn_id=None, **data):
-        mid = generate_random_id()
+        connection = self.handlers[conn_id]
+        mid = next(connection.__ids__)
         data["message_id"] = mid
 
-        handler = self.handlers[conn_id]
         q = queue.SimpleQueue()
 
         def handler(message):
-            self.message_handlers.pop(mid, None)
+            self.message_handlers.pop((conn_id, mid), None)
             try:
                 if isinstance(message, dict):
                     if message.get("response", UNDEFINED) != UNDEFINED:
@@ -1256,12 +1702,12 @@ class MultiServer(BridgeServer):
             except Exception:
                 q.put(message)
 
-        self.message_handlers[mid] = handler
+        self.message_handlers[(conn_id, mid)] = handler
 
         data["conn_id"] = conn_id
-        self.send(**data)
-
-        response = q.get(timeout=self.timeout)
+        with parked():
+            self.send(**data)
+            response = q.get(timeout=self.timeout)
         # queue.task_done()
         if isinstance(response, Exception):
             raise response
@@ -1285,7 +1731,9 @@ class MultiServer(BridgeServer):
             elif message.get("error"):
                 return queue.put_nowait(Exception(message["error"]))
             else:
-                handler = self.message_handlers.get(message.get("message_id"))
+                handler = self.message_handlers.get(
+                    (message.get("conn_id"), message.get("message_id"))
+                )
 
                 if handler:
                     return handler(message)
@@ -1304,19 +1752,102 @@ class AsyncMultiServer(BridgeServer):
     handlers: dict[str, connection]
 
     def __init__(
-        self, transporter=None, keep_alive=False, timeout=None, force_sync_calls=True
+        self, transporter=None, keep_alive=False, timeout=None, force_sync_calls=True,
+        reply_timeout=None
     ):
         super().__init__(transporter, keep_alive, timeout)
         self.handlers = {}
         self.force_sync_calls = force_sync_calls
-        self.conn_queues = queue.Queue()
+        # seconds `recieve` waits for the browser's reply, None as long as
+        # the page stays connected
+        self.reply_timeout = reply_timeout
+        # True records every new connection, a set only the conn_ids in it
+        self.recording = None
+        # conn_id -> Recording, see `record`
+        self.recordings = {}
+        # (conn_id, Recording) of the closed connections kept, oldest first
+        self.__recorded = deque()
+        self.keep_recordings = 16
+        # conn_id -> {name: callback}, callbacks scoped to their connection
+        self.namespaces = {}
+        # conn_id -> [(loop, future)] of get_connection calls still waiting
+        self.__waiters = {}
+        self.__waiters_lock = RLock()
+
+        self.metrics.gauge(
+            "connections", lambda: len(self.handlers), "Open browser connections"
+        )
+        self.metrics.gauge(
+            "queue_depth",
+            lambda: sum(
+                handler.__queue__.qsize() for handler in list(self.handlers.values())
+            ),
+            "Unclaimed messages queued on connections"
+        )
+        self.metrics.gauge(
+            "pool_pending",
+            lambda: {name: item["pending"] for name, item in pool_stats().items()},
+            "Jobs queued or running on the shared pools", label="pool"
+        )
+        self.metrics.gauge(
+            "pool_rejected",
+            lambda: {name: item["rejected"] for name, item in pool_stats().items()},
+            "Jobs the shared pools refused", label="pool"
+        )
+
+    def record(self, *conn_ids, keep=16):
+        """
+        Records the frames of the connections made from now on (or of those
+        to `conn_ids` only) into `recordings`, to be saved and replayed
+        later, see `recording.replay`.
+
+        The recordings of `conn_ids` stay until popped from `recordings`.
+        Recording every connection keeps only the `keep` last closed ones
+        (None keeps them all), besides those still open. `stop_recording`
+        ends it.
+        """
+        self.recording = set(conn_ids) if conn_ids else True
+        self.keep_recordings = keep
+
+    def stop_recording(self):
+        """
+        Stops recording, the connections still open included. What was
+        recorded stays in `recordings`.
+        """
+        self.recording = None
+        for handler in list(self.handlers.values()):
+            handler.__recording__ = None
+
+    def __recorded_closed(self, conn_id, recording):
+        if self.recordings.get(conn_id) is not recording:
+            # already taken out
+            return
+
+        self.__recorded.append((conn_id, recording))
+        keep = self.keep_recordings
+        while keep is not None and len(self.__recorded) > keep:
+            oldest, dropped = self.__recorded.popleft()
+            if self.recordings.get(oldest) is dropped:
+                del self.recordings[oldest]
 
     async def handle_connection(self, socket, conn_id):
         handler = self.create_connection(
             conn_id=conn_id, socket=ThreadSafeWrapper(socket)
         )
-        self.handlers[conn_id] = handler
-        self.conn_queues.put(conn_id)
+
+        # recordings of connections asked for by conn_id aren't dropped
+        recording, pinned = None, self.recording is not True
+        if self.recording is True or (self.recording and conn_id in self.recording):
+            recording = handler.__recording__ = self.recordings[conn_id] = Recording(
+                conn_id
+            )
+
+        with self.__waiters_lock:
+            self.handlers[conn_id] = handler
+            waiters = self.__waiters.pop(conn_id, [])
+
+        for loop, future in waiters:
+            resolve_threadsafe(loop, future, handler)
 
         while self.is_listening.is_set() and handler.__event__.is_set():
             try:
@@ -1324,39 +1855,101 @@ class AsyncMultiServer(BridgeServer):
             except Exception:
                 break
 
+            self.metrics.count("bytes_in", len(msg))
+            if handler.__recording__ is not None:
+                handler.__recording__.add("in", msg)
             splits = msg.split(";[::];")
             for split in splits:
                 await self.handler_message(split, handler)
 
         self.handlers.pop(conn_id)
+        if recording is not None and not pinned:
+            self.__recorded_closed(conn_id, recording)
         del handler
 
+        # calls still waiting on this page won't get a reply
+        for key in list(self.message_handlers):
+            if not (isinstance(key, tuple) and key[0] == conn_id):
+                continue
+            waiting = self.message_handlers.get(key)
+            if waiting is not None:
+                waiting(ConnectionError(f"{conn_id} disconnected."))
+
         return []
 
     async def handler_message(self, message, handler):
-        @async_daemon_task
-        async def onmessage(message):
-            await self.on_message(self.decode(message, handler))
+        if not message:
+            return
+        if DEBUG:
+            print("[PY] Received: ", message)
 
-        if message:
-            if DEBUG:
-                print("[PY] Received: ", message)
-            onmessage(message)
+        self.metrics.count("messages_in")
+        message = self.decode(message, handler)
+        if isinstance(message, dict):
+            message = expand_envelope(message)
+            if message.get("action") == "hello":
+                handler.__compact__ = True
+                return
+
+        if not (isinstance(message, dict) and "action" in message):
+            # replies only wake up their caller, no need to leave the loop
+            return await self.on_message(message)
+
+        # commands run callbacks that may block, on the bounded pool
+        try:
+            await pool("callbacks").asubmit(self.__run_command, message)
+        except RejectedError as e:
+            await self.send(
+                conn_id=message.get("conn_id"), error=str(e),
+                message_id=message.get("message_id")
+            )
+
+    def __run_command(self, message):
+        return run_coroutine(self.on_message(message))
 
     def create_connection(self, mode=None, conn_id=None, socket=None):
         return self.connection(socket=socket, server=self, conn_id=conn_id)
 
     async def get_connection(self, conn_id):
-        while self.is_listening.is_set():
+        if not self.is_listening.is_set():
+            raise Exception("No connection was made.")
+
+        loop = asyncio.get_running_loop()
+
+        with self.__waiters_lock:
+            if conn_id in self.handlers:
+                return self.handlers[conn_id]
+
+            future = loop.create_future()
+            self.__waiters.setdefault(conn_id, []).append((loop, future))
+
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            with self.__waiters_lock:
+                waiters = self.__waiters.get(conn_id, [])
+                if (loop, future) in waiters:
+                    waiters.remove((loop, future))
+            raise Exception("No connection was made.")
+
+    def abandon(self, conn_id):
+        """Fails the get_connection calls waiting on a page that won't connect"""
+        with self.__waiters_lock:
+            waiters = self.__waiters.pop(conn_id, [])
+
+        for loop, future in waiters:
             try:
-                item_id = self.conn_queues.get()
-                if item_id == conn_id:
-                    self.conn_queues.task_done()
-                    return self.handlers[conn_id]
-            except queue.Empty:
-                break
+                loop.call_soon_threadsafe(
+                    reject_future, future, Exception("No connection was made.")
+                )
+            except RuntimeError:
+                pass
 
-        raise Exception("No connection was made.")
+    def get_callback(self, target, handler=None):
+        namespace = self.namespaces.get(getattr(handler, "__conn_id__", None))
+        if namespace and target in namespace:
+            return namespace[target]
+        return super().get_callback(target, handler)
 
     def handle_call_stack_attribute(self, *a, **kw):
         if self.force_sync_calls:
@@ -1380,32 +1973,47 @@ class AsyncMultiServer(BridgeServer):
             return await handler.__send__(**kw)
 
     async def recieve(self, conn_id=None, **data):
-        mid = generate_random_id()
+        connection = self.handlers[conn_id]
+        mid = next(connection.__ids__)
         data["message_id"] = mid
+        if not DEFERRED.get():
+            await connection.__settle__()
 
-        handler = self.handlers[conn_id]
-        q = queue.Queue()
+        # replies are handled on whichever thread read them, the waiting
+        # loop is woken up rather than blocked on a queue
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
 
         def handler(message):
-            self.message_handlers.pop(mid, None)
+            self.message_handlers.pop((conn_id, mid), None)
             try:
                 if isinstance(message, dict):
                     if message.get("response", UNDEFINED) != UNDEFINED:
                         message = message["response"]
                     elif message.get("value", UNDEFINED) != UNDEFINED:
                         message = message["value"]
+            finally:
+                resolve_threadsafe(loop, future, message)
 
-                q.put(message)
-            except Exception:
-                q.put(message)
-
-        self.message_handlers[mid] = handler
+        self.message_handlers[(conn_id, mid)] = handler
 
         data["conn_id"] = conn_id
-        await self.send(**data)
-
-        response = q.get()
-        q.task_done()
+        started = self.metrics.begin(conn_id)
+        try:
+            # a callback waiting here gives up its place in the pool, the
+            # browser may call back into Python before replying
+            with parked():
+                await self.send(**data)
+                response = await asyncio.wait_for(future, self.reply_timeout)
+        except asyncio.TimeoutError:
+            self.message_handlers.pop((conn_id, mid), None)
+            raise TimeoutError(
+                f"{conn_id} didn't reply to {data.get('action')} in "
+                f"{self.reply_timeout} seconds."
+            ) from None
+        finally:
+            self.metrics.end(conn_id, data.get("action"), started)
+            trace_operation(data, started)
 
         if isinstance(response, Exception):
             raise response
@@ -1430,7 +2038,9 @@ class AsyncMultiServer(BridgeServer):
                 response["conn_id"] = message.get("conn_id")
                 return await self.send(**response)
             else:
-                handler = self.message_handlers.get(message.get("message_id"))
+                handler = self.message_handlers.get(
+                    (message.get("conn_id"), message.get("message_id"))
+                )
 
                 if handler:
                     return handler(message)
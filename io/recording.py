@@ -0,0 +1,279 @@
+"""
+Recordings of a connection's bridge traffic, and their replay.
+
+`AsyncMultiServer.record()` keeps every frame a connection sends and
+receives, with the time it did, in `server.recordings[conn_id]`:
+
+    app.server.record()
+    ...
+    app.server.recordings[conn_id].save("checkout.jsonl")
+    app.server.stop_recording()
+
+Recording every connection keeps the last 16 closed ones (see `record`'s
+`keep`), those asked for by conn_id are kept until popped.
+
+`replay` plays a recording's session again against an app, the current
+build, through a JSBridgeClient: the browser's own commands (its callbacks)
+are sent again in order, and the server's are answered from the page as
+they come. What the new session took is compared with the recorded one:
+
+    recording = Recording.load("checkout.jsonl")
+    replayed = await replay(recording, app, "/checkout")
+    compare(recording, replayed)
+"""
+import re
+import json
+import time
+import asyncio
+
+from .metrics import Histogram
+
+SEPARATOR = ";[::];"
+
+# reads of a browser object, whose recorded replies stand in for the object
+READS = {"get_stack_attribute", "get_proxy_attribute"}
+
+
+class Recording:
+  def __init__(self, conn_id, frames=None):
+    self.conn_id = conn_id
+    self.started = time.perf_counter()
+    # [seconds since started, "in" or "out", frame]
+    self.frames = frames or []
+
+  def add(self, direction, data):
+    self.frames.append([time.perf_counter() - self.started, direction, data])
+
+  def messages(self):
+    """The decoded messages, as (seconds, direction, message)"""
+    from .pybridge import expand_envelope
+
+    for seconds, direction, data in self.frames:
+      for part in data.split(SEPARATOR):
+        part = part.strip()
+        if not part:
+          continue
+        message = json.loads(part)
+        if isinstance(message, dict):
+          yield seconds, direction, expand_envelope(message)
+
+  def exchanges(self):
+    """
+    Every command with its reply, as (direction, sent, command, reply,
+    seconds): "out" for the server's commands to the browser, "in" for the
+    browser's, `sent` when and `seconds` how long until the reply. A
+    command never answered has None for reply and seconds.
+    """
+    pending, exchanges = {}, []
+
+    for seconds, direction, message in self.messages():
+      if message.get("action") == "hello":
+        continue
+      if message.get("action"):
+        exchange = [direction, seconds, message, None, None]
+        pending[(direction, message.get("message_id"))] = exchange
+        exchanges.append(exchange)
+      else:
+        sent = "in" if direction == "out" else "out"
+        exchange = pending.pop((sent, message.get("message_id")), None)
+        if exchange:
+          exchange[3], exchange[4] = message, seconds - exchange[1]
+
+    return [tuple(exchange) for exchange in exchanges]
+
+  def summary(self):
+    sizes = {"in": [], "out": []}
+    for _, direction, data in self.frames:
+      sizes[direction].append(len(data))
+
+    latency = {"out": Histogram(), "in": Histogram()}
+    commands = {"out": 0, "in": 0}
+    for direction, _, _, reply, seconds in self.exchanges():
+      commands[direction] += 1
+      if reply is not None:
+        latency[direction].observe(seconds)
+
+    return {
+      "frames_in": len(sizes["in"]),
+      "frames_out": len(sizes["out"]),
+      "bytes_in": sum(sizes["in"]),
+      "bytes_out": sum(sizes["out"]),
+      # the server waiting on the browser
+      "round_trips": commands["out"],
+      "round_trip_latency": latency["out"].snapshot(),
+      # the browser waiting on the server, callbacks mostly
+      "callbacks": commands["in"],
+      "callback_latency": latency["in"].snapshot(),
+      "seconds": self.frames[-1][0] if self.frames else 0.0,
+    }
+
+  def save(self, path):
+    with open(path, "w") as file:
+      file.write(json.dumps({"conn_id": self.conn_id}) + "\n")
+      for frame in self.frames:
+        file.write(json.dumps(frame) + "\n")
+
+  @classmethod
+  def load(cls, path):
+    with open(path) as file:
+      header = json.loads(file.readline())
+      frames = [json.loads(line) for line in file if line.strip()]
+    return cls(header["conn_id"], frames)
+
+
+def recorded_objects(recording):
+  """
+  The browser objects the server read in `recording`, rebuilt from the
+  replies it got as {location: nested dict}, e.g. `event.target.value`.
+  """
+  objects = {}
+
+  def node(location):
+    return objects.setdefault(str(location), {})
+
+  for direction, _, command, reply, _ in recording.exchanges():
+    if direction != "out" or reply is None or "error" in reply:
+      continue
+    if command["action"] not in READS or not command.get("location"):
+      continue
+
+    path = command.get("stack") or []
+    if command.get("target"):
+      path = str(command["target"]).split(".")
+    if not path:
+      continue
+
+    value = reply.get("response")
+    if isinstance(value, dict) and value.get("type") == "bridge_proxy":
+      if value.get("reverse") or not value.get("location"):
+        continue
+      value = node(value["location"])
+
+    target = node(command["location"])
+    for key in path[:-1]:
+      if not isinstance(target.get(key), dict):
+        target[key] = {}
+      target = target[key]
+    target[path[-1]] = value
+
+  return objects
+
+
+def rename(target, callbacks):
+  """
+  `target` as the page calls it now: callback names end in a counter that
+  can differ between builds, so a name missing from the page is matched
+  to the one callback of the page with its prefix, if there's just one.
+  """
+  if target in callbacks:
+    return target
+  prefix = re.sub(r"_\d+$", "", target)
+  matches = [name for name in callbacks if re.sub(r"_\d+$", "", name) == prefix]
+  return matches[0] if len(matches) == 1 else target
+
+
+async def replay(recording, app, path="/", timing=False, idle=0.1):
+  """
+  Plays the session in `recording` again against the BridgeIO `app`, and
+  returns the new session's Recording.
+
+  The page at `path` is loaded into a JSBridgeClient which sends the
+  browser's recorded commands again in order, each once the one before
+  was answered (or, with `timing`, no sooner than it was recorded). The
+  browser objects those commands passed, such as events, are stood in
+  for by what the server read of them in the recording. Once they're all
+  answered the session ends after `idle` seconds without traffic.
+  """
+  from .client import CALLBACK, browse
+
+  server = app.server
+  previous = server.recording
+  server.record()
+  try:
+    client, _ = await browse(app, path)
+  finally:
+    server.recording = previous
+  replayed = server.recordings.pop(client.conn_id)
+
+  callbacks = set(CALLBACK.findall(str(client.document)))
+  objects = recorded_objects(recording)
+  keys = {}
+
+  def remap(value):
+    if isinstance(value, list):
+      return [remap(item) for item in value]
+    if not isinstance(value, dict):
+      return value
+    if value.get("type") != "bridge_proxy":
+      return {key: remap(item) for key, item in value.items()}
+    if value.get("reverse"):
+      # the server's objects of the recorded session are gone
+      return None
+
+    location = str(value.get("location"))
+    if location not in keys:
+      keys[location] = client.proxy_object(objects.get(location, {}))
+    return {**value, "location": keys[location]}
+
+  start = time.perf_counter()
+  for direction, sent, command, _, _ in recording.exchanges():
+    if direction != "in":
+      continue
+
+    if timing:
+      delay = sent - (time.perf_counter() - start)
+      if delay > 0:
+        await asyncio.sleep(delay)
+
+    command = {
+      key: remap(value) for key, value in command.items()
+      if key not in ("message_id", "conn_id")
+    }
+    if command["action"] == "exec" and command.get("target"):
+      command["target"] = rename(command["target"], callbacks)
+
+    try:
+      await client.recieve(**command)
+    except Exception:
+      # errors are part of the session, they show in the comparison
+      pass
+
+  # what the commands set off, such as scheduled updates
+  count = -1
+  while count != len(replayed.frames):
+    count = len(replayed.frames)
+    await asyncio.sleep(idle)
+
+  await client.transport.close()
+  return replayed
+
+
+def compare(before, after):
+  """
+  What changed from the Recording `before` to `after`, per measure:
+  {"before", "after", "delta", "ratio"}.
+  """
+  before, after = before.summary(), after.summary()
+  measures = {}
+
+  for key in (
+    "round_trips", "callbacks", "frames_in", "frames_out",
+    "bytes_in", "bytes_out",
+  ):
+    measures[key] = (before[key], after[key])
+
+  for kind in ("round_trip_latency", "callback_latency"):
+    for percentile in ("p50", "p90", "p99"):
+      measures[f"{kind} {percentile}"] = (
+        before[kind][percentile], after[kind][percentile]
+      )
+
+  return {
+    key: {
+      "before": old,
+      "after": new,
+      "delta": new - old,
+      "ratio": new / old if old else None,
+    }
+    for key, (old, new) in measures.items()
+  }
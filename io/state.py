@@ -0,0 +1,197 @@
+"""
+The state a BridgeIO app may have to share between processes: which
+process owns a connection, the callbacks registered for the pages it
+rendered, and a relay to pass messages to another process.
+
+`MemoryState` keeps everything in the current process and is the default.
+`SocketState` shares connection ownership through a manager process and
+relays messages over local sockets, so a WebSocket that reaches a worker
+other than the one that rendered its page is forwarded to the owner.
+"""
+import os
+from abc import ABC, abstractmethod
+from threading import Thread, RLock
+from multiprocessing import current_process
+from multiprocessing.managers import SyncManager
+from multiprocessing.connection import Listener, Client
+
+
+class StateBackend(ABC):
+  """
+  Interface shared by the state backends, which implement the abstract
+  methods: `id`, connection ownership and `relay`.
+
+  `callbacks` maps each connection to its own namespace of callback names
+  and functions, so registering, looking up and tearing down a connection's
+  callbacks doesn't depend on how many other connections are alive.
+  Functions never leave the process that registered them.
+  """
+
+  def __init__(self, callbacks=None):
+    self.callbacks = {} if callbacks is None else callbacks
+    self.handlers = []
+
+  @property
+  @abstractmethod
+  def id(self):
+    """Identifies the current process to the other ones"""
+
+  # connection ownership
+
+  @abstractmethod
+  def claim(self, conn_id):
+    """Records the current process as the owner of `conn_id`"""
+
+  @abstractmethod
+  def owner(self, conn_id):
+    """Id of the process owning `conn_id`, None if nobody claimed it"""
+
+  @abstractmethod
+  def release(self, conn_id):
+    """Forgets who owns `conn_id`"""
+
+  # callback registry
+
+  def namespace(self, conn_id):
+    return self.callbacks.setdefault(conn_id, {})
+
+  def register(self, conn_id, name, callback):
+    self.namespace(conn_id)[name] = callback
+
+  def lookup(self, conn_id, name):
+    return self.callbacks.get(conn_id, {}).get(name)
+
+  def unregister(self, conn_id, name):
+    return self.callbacks.get(conn_id, {}).pop(name, None)
+
+  def drop(self, conn_id):
+    """Forgets every callback of `conn_id` at once"""
+    return self.callbacks.pop(conn_id, None)
+
+  # message relay
+
+  def subscribe(self, handler):
+    """Calls `handler(message)` for every message relayed to this process"""
+    self.handlers.append(handler)
+    return handler
+
+  @abstractmethod
+  def relay(self, process, message):
+    """Sends `message` (anything picklable) to the process `process`"""
+
+  def dispatch(self, message):
+    for handler in self.handlers:
+      handler(message)
+
+
+class MemoryState(StateBackend):
+  """Everything in the current process, as a single process app needs"""
+
+  def __init__(self, callbacks=None):
+    super().__init__(callbacks)
+    self.owners = {}
+
+  @property
+  def id(self):
+    return "local"
+
+  def claim(self, conn_id):
+    self.owners[conn_id] = self.id
+
+  def owner(self, conn_id):
+    return self.owners.get(conn_id)
+
+  def release(self, conn_id):
+    self.owners.pop(conn_id, None)
+
+  def relay(self, process, message):
+    self.dispatch(message)
+
+
+class SocketState(StateBackend):
+  """
+  Connection ownership lives in a `multiprocessing` manager and messages
+  are relayed over a listener each process opens on first use.
+
+  Create it before forking the workers; by default it starts its own
+  manager, pass `address` (and `authkey`) to use a running one instead.
+  """
+
+  def __init__(self, address=None, authkey=None, callbacks=None):
+    super().__init__(callbacks)
+
+    if address is None:
+      self.manager = SyncManager(authkey=authkey)
+      self.manager.start()
+    else:
+      self.manager = SyncManager(address, authkey=authkey)
+      self.manager.connect()
+
+    self.authkey = authkey or current_process().authkey
+
+    # conn_id -> process id, and process id -> listener address
+    self.owners = self.manager.dict()
+    self.listeners = self.manager.dict()
+
+    self.__pid = None
+    self.__lock = RLock()
+    self.__clients = {}
+
+  @property
+  def id(self):
+    return str(os.getpid())
+
+  def __listen(self):
+    """Starts this process' listener, once per process"""
+    with self.__lock:
+      if self.__pid == os.getpid():
+        return
+      self.__pid = os.getpid()
+      # connections inherited through a fork belong to the parent
+      self.__clients = {}
+
+      listener = Listener(authkey=self.authkey)
+      self.listeners[self.id] = listener.address
+
+    Thread(target=self.__accept, args=(listener,), daemon=True).start()
+
+  def __accept(self, listener):
+    while True:
+      try:
+        connection = listener.accept()
+      except OSError:
+        return
+      Thread(target=self.__read, args=(connection,), daemon=True).start()
+
+  def __read(self, connection):
+    with connection:
+      while True:
+        try:
+          message = connection.recv()
+        except (EOFError, OSError):
+          return
+        self.dispatch(message)
+
+  def claim(self, conn_id):
+    self.__listen()
+    self.owners[conn_id] = self.id
+
+  def owner(self, conn_id):
+    return self.owners.get(conn_id)
+
+  def release(self, conn_id):
+    self.owners.pop(conn_id, None)
+
+  def relay(self, process, message):
+    if process == self.id:
+      return self.dispatch(message)
+
+    # replies have to find their way back here
+    self.__listen()
+
+    with self.__lock:
+      client = self.__clients.get(process)
+      if client is None:
+        client = Client(self.listeners[process], authkey=self.authkey)
+        self.__clients[process] = client
+      client.send(message)
@@ -0,0 +1,196 @@
+"""
+Traces of the bridge operations a request handler or a callback issues.
+
+Sequential round trips are the usual reason a page is slow: every awaited
+proxy read is a full trip to the browser and back. Tracing is opt-in,
+with `route(..., trace=True)` or `configure(..., trace=True)` (or a dict
+of budgets instead of True), or around any block:
+
+    with tracing.trace("checkout") as t:
+        ...
+    t.summary()
+
+A finished trace past one of its budgets warns with a ChattyBridgeWarning
+and is kept in `TRACES`, the last few traces taken.
+"""
+import time
+import warnings
+from functools import wraps
+from inspect import isawaitable
+from collections import Counter, deque
+from contextvars import ContextVar
+from contextlib import contextmanager
+
+# the trace operations are recorded to, if any
+TRACE = ContextVar("TRACE", default=None)
+
+# the last traces taken, newest last
+TRACES = deque(maxlen=100)
+
+BUDGETS = {"round_trips": 100, "serial_depth": 50, "batchable": 20}
+
+READS = {
+  "get_stack_attribute", "get_stack_attributes", "get_primitive", "evaluate",
+}
+WRITES = {"set_stack_attribute", "set_proxy_attribute"}
+
+
+class ChattyBridgeWarning(RuntimeWarning):
+  """A trace went over one of its round trip budgets"""
+
+
+def operation_path(data):
+  """The JS path an operation works on, as `document.title`"""
+  path = [str(item) for item in data.get("stack") or ()]
+  if data.get("target") is not None:
+    path.append(str(data["target"]))
+  if data.get("location"):
+    path.insert(0, f"<{data['location']}>")
+  return ".".join(path) or str(data.get("value", ""))
+
+
+class Trace:
+  def __init__(self, name=None, budgets=None):
+    self.name = name
+    self.budgets = {**BUDGETS, **(budgets or {})}
+    self.operations = []
+
+  def record(self, action, path, started, ended):
+    operation = {
+      "action": action,
+      "path": path,
+      "started": started,
+      "seconds": ended - started,
+      "batchable": False,
+    }
+
+    # a read after a read (or a write after a write) on the same object
+    # that waited for it to finish could have gone in the same trip
+    if self.operations:
+      previous = self.operations[-1]
+      if (
+        previous["started"] + previous["seconds"] <= started
+        and previous["path"].split(".", 1)[0] == path.split(".", 1)[0]
+        and (
+          (action in READS and previous["action"] in READS)
+          or (action in WRITES and previous["action"] in WRITES)
+        )
+      ):
+        operation["batchable"] = True
+
+    self.operations.append(operation)
+
+  @property
+  def serial_depth(self):
+    """The longest chain of operations each waiting for the one before"""
+    depth, end = 0, float("-inf")
+    for operation in sorted(
+      self.operations, key=lambda item: item["started"] + item["seconds"]
+    ):
+      if operation["started"] >= end:
+        depth += 1
+        end = operation["started"] + operation["seconds"]
+    return depth
+
+  def summary(self, top=5):
+    operations = self.operations
+
+    if operations:
+      first = min(operation["started"] for operation in operations)
+      last = max(
+        operation["started"] + operation["seconds"] for operation in operations
+      )
+    else:
+      first = last = 0.0
+
+    return {
+      "name": self.name,
+      "round_trips": len(operations),
+      "serial_depth": self.serial_depth,
+      "batchable": sum(operation["batchable"] for operation in operations),
+      "seconds": sum(operation["seconds"] for operation in operations),
+      "wall": last - first,
+      "actions": dict(Counter(operation["action"] for operation in operations)),
+      "top_paths": Counter(
+        operation["path"] for operation in operations
+      ).most_common(top),
+    }
+
+  def check(self):
+    """Warns about every budget the trace went over"""
+    summary = self.summary()
+    over = [
+      f"{key} {summary[key]} > {budget}"
+      for key, budget in self.budgets.items()
+      if budget is not None and summary.get(key, 0) > budget
+    ]
+    if over:
+      paths = ", ".join(f"{path} x{count}" for path, count in summary["top_paths"])
+      warnings.warn(
+        f"{self.name or 'Bridge trace'}: {'; '.join(over)} (top paths: {paths})",
+        ChattyBridgeWarning, stacklevel=2
+      )
+    return summary
+
+
+def finish(current):
+  TRACES.append(current)
+  return current.check()
+
+
+@contextmanager
+def trace(name=None, budgets=None):
+  """Records the bridge operations issued inside the block"""
+  current = Trace(name, budgets)
+  token = TRACE.set(current)
+  try:
+    yield current
+  finally:
+    TRACE.reset(token)
+    finish(current)
+
+
+def traced(func, name=None, budgets=None):
+  """
+  `func` with every call traced. When the call returns an awaitable, as
+  async callbacks do, the trace lasts until it's awaited.
+  """
+  name = name or getattr(func, "__qualname__", None)
+
+  @wraps(func)
+  def wrapper(*args, **kwargs):
+    current = Trace(name, budgets)
+    token = TRACE.set(current)
+    try:
+      result = func(*args, **kwargs)
+    except BaseException:
+      finish(current)
+      raise
+    finally:
+      TRACE.reset(token)
+
+    if not isawaitable(result):
+      finish(current)
+      return result
+
+    async def awaiting():
+      token = TRACE.set(current)
+      try:
+        return await result
+      finally:
+        TRACE.reset(token)
+        finish(current)
+
+    return awaiting()
+
+  return wrapper
+
+
+def record(data, started, ended=None):
+  """Adds the operation `data`, sent at `started`, to the current trace"""
+  current = TRACE.get()
+  if current is not None:
+    current.record(
+      data.get("action"), operation_path(data), started,
+      time.perf_counter() if ended is None else ended
+    )
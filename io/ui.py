@@ -1,10 +1,16 @@
+import json
+import asyncio
 import inspect
-import random
 import typing as t
+import weakref
+import zlib
+from itertools import count
+from bisect import bisect_left
 from functools import wraps
+from threading import RLock
 
-from .utils import Hooks
-from .pybridge import force_sync, async_daemon_task as _
+from .utils import Hooks, LRUCache
+from .pybridge import PORTAL, async_daemon_task as _
 
 SINGLE_TAGS = [
   "input",
@@ -62,11 +68,44 @@ ATTRIBUTE_VALUE_SUBSTITUTES = {
 
 def configure(
   args=None, as_callback=False,
-  response=None, name=None
+  response=None, name=None, project=None,
+  debounce=None, throttle=None, latest=False, frame=False, offload=None,
+  trace=False
 ):
+  """
+  `project` declares the fields the callback reads from its arguments, as
+  {"event": ["key", "target.value"], "this": ["value"]} or just a list for
+  the first argument. The browser sends them along with the call, so they
+  are plain values instead of proxies that need a round trip each.
+
+  `debounce` and `throttle` (in milliseconds), `frame` (one call per
+  animation frame) and `latest` (no new call while one is in flight) rate
+  control the callback in the browser. Events held back are replaced by
+  newer ones, the server counts them in `callback_stats` as dropped.
+
+  `offload="process"` runs a CPU-heavy callback on the `cpu` worker
+  process pool so it doesn't hold up the server. It has to be defined at
+  module level and its arguments have to be picklable: project the fields
+  it reads from browser objects, proxies can't leave the server process.
+
+  `trace=True` (or a dict of budgets) traces the bridge operations each
+  call issues, see `tracing`.
+  """
+  if offload not in (None, "process"):
+    raise ValueError(f"Unknown offload {offload!r}, use \"process\"")
+
   def wrapper(func):
     func.__pass_args__ = args
     func.__as_callback__ = as_callback
+    func.__project__ = project
+    func.__offload__ = offload
+    func.__trace__ = trace
+    func.__limits__ = {
+      key: value for key, value in (
+        ("debounce", debounce), ("throttle", throttle),
+        ("latest", latest), ("frame", frame),
+      ) if value
+    }
 
     class wrapped:
       def __init__(self):
@@ -139,6 +178,9 @@ async def create_element(browser, html, vnode):
   for attr in vnode.attributes:
     value = vnode.attributes[attr]
 
+    if isinstance(value, Reactive):
+      value = value.get()
+
     if callable(value):
       value = build_client_callback(value, html.response)
 
@@ -173,6 +215,9 @@ async def patchAttributes(vdom, dom, browser, html):
   for key in vdomAttributes:
     value = vdomAttributes[key]
 
+    if isinstance(value, Reactive):
+      value = value.get()
+
     if callable(value):
       value = build_client_callback(value, html.response)
 
@@ -190,6 +235,145 @@ async def patchAttributes(vdom, dom, browser, html):
       await dom.removeAttribute(key)
 
 
+def longest_increasing_subsequence(sequence):
+  """
+  Returns the indices of a longest strictly increasing subsequence
+  of `sequence`, ignoring negative entries (new nodes).
+  """
+  tails = []
+  previous = [-1] * len(sequence)
+
+  for index, value in enumerate(sequence):
+    if value < 0:
+      continue
+
+    position = bisect_left(tails, value, key=sequence.__getitem__)
+    if position > 0:
+      previous[index] = tails[position - 1]
+
+    if position == len(tails):
+      tails.append(index)
+    else:
+      tails[position] = index
+
+  result = []
+  index = tails[-1] if tails else -1
+  while index >= 0:
+    result.append(index)
+    index = previous[index]
+
+  result.reverse()
+  return result
+
+
+def keyed_diff(old_keys, new_keys):
+  """
+  Computes the operations turning the children keyed `old_keys` into
+  `new_keys`. Nodes on the longest increasing subsequence stay where they
+  are, everything else is moved, inserted or removed.
+
+  Operations are `["remove", key]`, `["move", key, before]` and
+  `["insert", key, before]`, where `before` is the key of the sibling to
+  insert in front of (None to append). They must be applied in order.
+  """
+  wanted = set(new_keys)
+  old_index = {key: index for index, key in enumerate(old_keys)}
+
+  operations = [["remove", key] for key in old_keys if key not in wanted]
+
+  sources = [old_index.get(key, -1) for key in new_keys]
+  stable = set(longest_increasing_subsequence(sources))
+
+  before = None
+  for index in range(len(new_keys) - 1, -1, -1):
+    key = new_keys[index]
+
+    if sources[index] < 0:
+      operations.append(["insert", key, before])
+    elif index not in stable:
+      operations.append(["move", key, before])
+
+    before = key
+
+  return operations
+
+
+def child_keys(vdom):
+  """Returns the keys of all children of `vdom`, or None if they aren't all uniquely keyed."""
+  keys = []
+
+  for child in vdom.children:
+    if isinstance(child, Reactive):
+      child = child.get()
+
+    if not isinstance(child, Element) or child.key is None:
+      return None
+    keys.append(str(child.key))
+
+  if not keys or len(set(keys)) != len(keys):
+    return None
+  return keys
+
+
+async def diff_keyed(browser, html, vdom, dom, keys):
+  found = await browser.JSBridge.childKeys(dom) or []
+  # unkeyed leftovers are dropped by reconcileKeyed
+  current = [key for key in found if key is not None]
+
+  children = []
+  for child in vdom.children:
+    if isinstance(child, Reactive):
+      child = child.get()
+    children.append(child)
+
+  by_key = dict(zip(keys, children))
+
+  inserted = set()
+  operations = keyed_diff(current, keys)
+  for operation in operations:
+    if operation[0] == "insert":
+      inserted.add(operation[1])
+      operation.append(by_key[operation[1]].__compile__(True))
+
+  # the kept children are brought up to date in the same call rather than
+  # diffed one by one, the browser only touches those that changed
+  operations.extend(
+    ["update", key, None, child.__compile__(True)]
+    for key, child in by_key.items() if key not in inserted
+  )
+  await browser.JSBridge.reconcileKeyed(dom, operations)
+
+
+def element_path(element, root):
+  """
+  Returns the element-child indices leading from `root` to `element`,
+  or None if `element` isn't attached below `root`.
+  """
+  path = []
+
+  while element is not root:
+    parent = element.parent
+    if parent is None:
+      return None
+
+    index = 0
+    for sibling in parent.children:
+      if isinstance(sibling, Reactive):
+        sibling = sibling.get()
+      if sibling is element:
+        break
+      if isinstance(sibling, Element):
+        index += 1
+    else:
+      return None
+
+    path.append(index)
+    element = parent
+
+  path.reverse()
+  return path
+
+
 async def diff(browser, html, vdom, dom):
   if not dom or not vdom:
     return
@@ -208,6 +392,11 @@ async def diff(browser, html, vdom, dom):
     if vdom.__compile__(True) == await dom.innerHTML:
       return
 
+    # keyed children are matched by key instead of position
+    keys = child_keys(vdom)
+    if keys is not None:
+      return await diff_keyed(browser, html, vdom, dom, keys)
+
     # if dom has extra child
     c_length = await dom.childNodes.length
 
@@ -250,6 +439,157 @@ async def diff(browser, html, vdom, dom):
         await diff(browser, html, child, dchild)
 
 
+# callable -> {bound function or None: callback id}, while the callable lives
+CALLBACK_IDS = weakref.WeakKeyDictionary()
+# code -> {shape: [callback id, weak references]}, for functions rebuilt
+# every render, while every value the shape captured is alive
+CALLBACK_SHAPES = weakref.WeakKeyDictionary()
+# shapes kept per code, the oldest go first (those of immutable values
+# only have nothing to expire with)
+CALLBACK_SHAPES_SIZE = 1024
+CALLBACK_COUNT = count()
+
+# captured values of these types are told apart by value, not identity
+IMMUTABLE = (str, bytes, int, float, complex, bool, type(None))
+# marks the values of a shape told apart by identity
+IDENTITY = object()
+
+
+def is_immutable(value):
+  if type(value) is tuple:
+    return all(is_immutable(item) for item in value)
+  return type(value) in IMMUTABLE
+
+
+def typed(value):
+  """An immutable value with its type, as True, 1 and 1.0 are equal"""
+  if type(value) is tuple:
+    return (tuple, tuple(typed(item) for item in value))
+  return (type(value).__qualname__, value)
+
+
+def callback_shape(func):
+  """
+  What tells apart the functions made from the same code: the values they
+  capture in closure cells and defaults, returned with the ones compared
+  by identity. Immutable values are compared by type and value. None if
+  one of the others can't be referenced weakly, as a shape can only be
+  trusted while the values it was made from are alive.
+  """
+  values = []
+  for cell in func.__closure__ or ():
+    try:
+      values.append(cell.cell_contents)
+    except ValueError:
+      values.append(None)
+  values.extend(func.__defaults__ or ())
+  for key, value in (func.__kwdefaults__ or {}).items():
+    values.extend((key, value))
+
+  shape, captured = [], []
+  for value in values:
+    if is_immutable(value):
+      shape.append(typed(value))
+      continue
+
+    try:
+      weakref.ref(value)
+    except TypeError:
+      return None
+    shape.append((IDENTITY, id(value)))
+    captured.append(value)
+
+  return tuple(shape), captured
+
+
+def shape_id(callback, name):
+  """The id shared by the live functions with `callback`'s code and shape"""
+  found = callback_shape(callback)
+  if found is None:
+    return None
+  shape, captured = found
+
+  shapes = CALLBACK_SHAPES.setdefault(callback.__code__, {})
+  entry = shapes.get(shape)
+  if entry is not None and all(
+    ref() is value for ref, value in zip(entry[1], captured)
+  ):
+    return entry[0]
+
+  entry = [f"{name}_{next(CALLBACK_COUNT)}", []]
+
+  def forget(_):
+    # the first captured value to go takes the entry with it
+    if shapes.get(shape) is entry:
+      del shapes[shape]
+
+  entry[1] = [weakref.ref(value, forget) for value in captured]
+  shapes[shape] = entry
+  while len(shapes) > CALLBACK_SHAPES_SIZE:
+    shapes.pop(next(iter(shapes)), None)
+  return entry[0]
+
+
+def code_id(callback, name, response=None):
+  """
+  A name for a callback that can't be tracked weakly, made from the
+  qualified name of its code rather than its address, so every build
+  names it the same. Other callables of that code on `response`'s page
+  get the next number.
+  """
+  func = getattr(callback, "__func__", callback)
+  code = getattr(func, "__code__", None)
+  where = code.co_qualname if code else type(func).__qualname__
+  base = candidate = f"{name}_{zlib.crc32(where.encode())}"
+
+  number = 0
+  while response is not None:
+    value = response.get_value(candidate)
+    if value is None or value == callback:
+      break
+    number += 1
+    candidate = f"{base}_{number}"
+  return candidate
+
+
+def callback_id(callback, response=None):
+  """
+  A name for `callback` that stays the same across renders, so unchanged
+  handlers produce the same markup. A function defined again on every
+  render keeps its name as long as it captures the same values, unless
+  one of them is mutable and can't be referenced weakly (a list or dict).
+  Callables that can't be referenced weakly themselves are named after
+  their code, see `code_id`.
+  """
+  owner, key = callback, None
+  if inspect.ismethod(callback):
+    # bound methods are new objects on every attribute access
+    owner, key = callback.__self__, callback.__func__
+
+  name = getattr(callback, "__name__", "")
+  if not name.isidentifier():
+    name = "func"
+
+  try:
+    ids = CALLBACK_IDS.setdefault(owner, {})
+  except TypeError:
+    return code_id(callback, name, response)
+
+  if key in ids:
+    return ids[key]
+
+  if inspect.isfunction(callback):
+    ids[key] = shape_id(callback, name)
+  if ids.get(key) is None:
+    ids[key] = f"{name}_{next(CALLBACK_COUNT)}"
+  return ids[key]
+
+
+def project_argument(argument, paths):
+  paths = ", ".join(f"'{path}'" for path in paths)
+  return f"client.project({argument}, [{paths}])"
+
+
 def build_client_callback(callback, name_or_response=None, func_name=None):
   name = response = None
   if func_name:
@@ -269,26 +609,37 @@ def build_client_callback(callback, name_or_response=None, func_name=None):
 
   if response:
     if not name:
-      possibleName = response.get_key(callback)
-      if possibleName:
-        name = possibleName
-
-      name = getattr(callback, "__name__", None)
-
-      if not name or name == "<lambda>":
-        name = f"func_{random.randint(0, 9999999)}"
-
-      name = f"{name}_{response.id}"
+      name = response.get_key(callback) or callback_id(callback, response)
     else:
       value = response.get_value(name)
-      if value and value != callback:
-        name = f"{random.randint(0, 999)}{name}"
+      if value is not None and value != callback:
+        name = callback_id(callback, response)
 
-    response.register(name, callback)
+    # re-renders of an unchanged handler don't register it again
+    if response.get_value(name) != callback:
+      response.register(name, callback)
 
-  script = f"client.exec('{name}'"
+  limits = getattr(callback, "__limits__", None)
+  if limits:
+    options = ", ".join(
+      f"{key}: {json.dumps(value)}" for key, value in limits.items()
+    )
+    script = f"client.limit('{name}', {{{options}}}"
+  else:
+    script = f"client.exec('{name}'"
   arguments = getattr(callback, "__pass_args__", None) or ["event"]
 
+  project = getattr(callback, "__project__", None)
+  if isinstance(project, (list, tuple)):
+    project = {arguments[0]: project}
+
+  if project:
+    arguments = [
+      project_argument(argument, project[argument])
+      if argument in project else argument
+      for argument in arguments
+    ]
+
   if arguments:
     arguments = ", ".join(arguments)
     script = script + ", " + arguments
@@ -301,9 +652,18 @@ def build_client_callback(callback, name_or_response=None, func_name=None):
   return script + ")"
 
 
+REF_IDS = count()
+
+
 class Ref:
   def __init__(self):
     self.__proxy = None
+    # stable across renders so the same selector is registered every time
+    self.__id = next(REF_IDS)
+
+  @property
+  def id(self):
+    return self.__id
 
   @property
   def value(self):
@@ -316,7 +676,7 @@ class Ref:
     return getattr(self.__proxy, name)
 
   def __setattr__(self, name, value):
-    if name == "_Ref__proxy":
+    if name in ("_Ref__proxy", "_Ref__id"):
       return super().__setattr__(name, value)
     return setattr(self.__proxy, name, value)
 
@@ -324,18 +684,353 @@ class Ref:
 class Reactive(Hooks):
   def __init__(self, initial_value=None):
     self.__value = initial_value
+    # weak, so discarded trees don't stay alive through their values
+    self.__dependents = weakref.WeakSet()
     super().__init__()
 
+  @property
+  def dependents(self):
+    return self.__dependents
+
+  def __depend__(self, element):
+    """Records that `element` read this value while compiling"""
+    self.__dependents.add(element)
+
+  def __undepend__(self, element):
+    self.__dependents.discard(element)
+
   async def set(self, value):
     oldValue = self.__value
     self.__value = value
     await self.dispatch("change", oldValue)
+
+    # only the elements that read this value need re-rendering
+    for element in list(self.__dependents):
+      await element.html.dispatch("update", element)
     return value
 
   def get(self):
     return self.__value
 
 
+class UpdateScheduler:
+  """
+  Coalesces update requests into batches. Every target scheduled within
+  the same frame (`interval` seconds, 0 for the next tick) is handed to
+  `callback` in a single call.
+
+  Batches run one at a time on `loop`, the loop running when the scheduler
+  was created unless given (the shared portal's if there was none), and
+  requests from other threads are handed to it.
+  """
+
+  def __init__(self, callback, interval=1 / 60, loop=None):
+    self.callback = callback
+    self.interval = interval
+
+    if loop is None:
+      try:
+        loop = asyncio.get_running_loop()
+      except RuntimeError:
+        pass
+    self.loop = loop
+
+    self.requested = 0
+    self.flushes = 0
+
+    self.__dirty = {}
+    self.__pending = False
+    self.__lock = RLock()
+    # awaited on the loop, so a flush waiting on another never blocks it
+    self.__running = asyncio.Lock()
+    # timed flushes in flight
+    self.__tasks = set()
+
+  @property
+  def coalesced(self):
+    """Number of requests that were served by another request's flush"""
+    return self.requested - self.flushes - len(self.__dirty)
+
+  @property
+  def stats(self):
+    return {
+      "requested": self.requested,
+      "flushes": self.flushes,
+      "coalesced": self.coalesced,
+      "pending": len(self.__dirty),
+    }
+
+  def __loop(self):
+    if self.loop is None or self.loop.is_closed():
+      try:
+        self.loop = asyncio.get_running_loop()
+      except RuntimeError:
+        self.loop = PORTAL.loop
+    return self.loop
+
+  def schedule(self, target=None):
+    with self.__lock:
+      self.requested += 1
+      self.__dirty[target] = None
+
+      if self.__pending:
+        return
+      self.__pending = True
+
+    loop = self.__loop()
+    try:
+      running = asyncio.get_running_loop()
+    except RuntimeError:
+      running = None
+
+    if running is loop:
+      loop.call_later(self.interval, self.__flush_later)
+    else:
+      loop.call_soon_threadsafe(
+        loop.call_later, self.interval, self.__flush_later
+      )
+
+  def __flush_later(self):
+    task = self.loop.create_task(self.flush())
+    self.__tasks.add(task)
+    task.add_done_callback(self.__tasks.discard)
+
+  async def flush(self):
+    """Runs the pending batch now instead of waiting for the frame to end"""
+    loop = self.__loop()
+    if asyncio.get_running_loop() is not loop:
+      return await asyncio.wrap_future(
+        asyncio.run_coroutine_threadsafe(self.flush(), loop)
+      )
+
+    async with self.__running:
+      with self.__lock:
+        targets = list(self.__dirty)
+        self.__dirty.clear()
+        self.__pending = False
+
+      if not targets:
+        return
+
+      self.flushes += 1
+      await self.callback(targets)
+
+
+def is_callback(value):
+  return callable(value) and not isinstance(value, (type, Ref, Reactive))
+
+
+def render_attribute(element, attr, value, rerender=False):
+  """`attr` rendered as ` name="value"`, or an empty string if it's left out"""
+  name = ATTRIBUTE_NAME_SUBSTITUTES.get(attr, attr).replace("_", "-")
+
+  if isinstance(value, Reactive):
+    value = value.get()
+  if isinstance(value, str):
+    value = ATTRIBUTE_VALUE_SUBSTITUTES.get(value, value)
+
+  if attr == "ref" and isinstance(value, Ref):
+    if "id" in element.attributes:
+      query = f"#{element.attributes.get('id')}"
+    else:
+      query = f'[ref="{value.id}"]'
+
+    if not rerender:
+      element.html.__ref__(query, value)
+    value = str(value.id)
+  elif attr == "style" and isinstance(value, dict):
+    value = ";".join(f"{ikey}: {ivalue}" for ikey, ivalue in value.items())
+  elif is_callback(value):
+    if not element.html.response:
+      return ""
+    value = build_client_callback(value, element.html.response)
+
+  if not value:
+    return ""
+  return f' {name}="{value}"' if value != True else f" {name}"
+
+
+def tracked(name, base, *methods):
+  """
+  A `base` subclass whose mutating `methods` invalidate the compiled
+  templates of the element that owns it.
+  """
+
+  def method(name):
+    original = getattr(base, name)
+
+    @wraps(original)
+    def wrapper(self, *args, **kwargs):
+      result = original(self, *args, **kwargs)
+      self.owner.__invalidate__()
+      return result
+
+    return wrapper
+
+  def __init__(self, owner, *args):
+    base.__init__(self, *args)
+    self.owner = owner
+
+  namespace = {name: method(name) for name in methods}
+  namespace["__init__"] = __init__
+  return type(name, (base,), namespace)
+
+
+Attributes = tracked(
+  "Attributes", dict, "__setitem__", "__delitem__", "update",
+  "pop", "popitem", "setdefault", "clear"
+)
+Children = tracked(
+  "Children", list, "__setitem__", "__delitem__", "__iadd__", "append", "extend",
+  "insert", "remove", "pop", "clear", "sort", "reverse"
+)
+
+
+class AttributeSlot:
+  """An attribute whose value is looked up again on every render"""
+
+  def __init__(self, element, path, attr):
+    self.name = element.name
+    self.path = path
+    self.attr = attr
+
+  def render(self, root, rerender=False):
+    element = resolve_path(root, self.path, self.name)
+    value = element.attributes[self.attr]
+
+    if isinstance(value, Reactive):
+      value.__depend__(element)
+    return render_attribute(element, self.attr, value, rerender)
+
+  def kind(self, root):
+    element = resolve_path(root, self.path, self.name)
+    return slot_kind(element.attributes.get(self.attr))
+
+
+class ChildSlot:
+  """A Reactive child, rendered from its current value"""
+
+  def __init__(self, element, path, index, depth):
+    self.name = element.name
+    self.path = path
+    self.index = index
+    self.depth = depth
+
+  def render(self, root, rerender=False):
+    element = resolve_path(root, self.path, self.name)
+    child = element.children[self.index]
+
+    if isinstance(child, Reactive):
+      child.__depend__(element)
+      child = child.get()
+
+    if isinstance(child, Element):
+      return child.__compile__(rerender, self.depth)
+    return str(child)
+
+  def kind(self, root):
+    element = resolve_path(root, self.path, self.name)
+    if self.index >= len(element.children):
+      return None
+    return slot_kind(element.children[self.index])
+
+
+def resolve_path(root, path, name):
+  element = root
+  try:
+    for index in path:
+      element = element.children[index]
+  except (IndexError, AttributeError):
+    element = None
+
+  if getattr(element, "name", None) != name:
+    raise ValueError(f"Template expected <{name}> at {list(path)}")
+  return element
+
+
+def slot_kind(value):
+  """What a slot holds: Reactive, Ref, "callback", or None for no slot"""
+  if isinstance(value, (Reactive, Ref)):
+    return type(value)
+  if is_callback(value):
+    return "callback"
+  return None
+
+
+# static HTML of the subtrees marked `cacheable`, by key and indentation
+FRAGMENTS = LRUCache(1024)
+
+
+class Template:
+  """
+  An element tree split into static HTML chunks and dynamic slots
+  (Reactive values, callbacks and refs). Rendering only joins the chunks
+  with the current slot values.
+
+  A template can render any tree with the same structure as the one it
+  was compiled from, but text and attributes that aren't slots are baked
+  in: anything that differs between trees has to go through a Reactive.
+  Templates made with `reusable` know what each of their slots held when
+  compiled, and `matches` tells whether another tree's slots hold the
+  same, without looking at the rest of it.
+  """
+
+  def __init__(self, name, parts, kinds=None):
+    self.name = name
+    self.parts = parts
+    self.kinds = kinds
+
+  @property
+  def slots(self):
+    return [part for part in self.parts if not isinstance(part, str)]
+
+  @classmethod
+  def compile(cls, element, depth=0):
+    parts = []
+    element.__build__(parts, (), depth)
+
+    # merge the runs of static chunks
+    merged, run = [], []
+    for part in parts:
+      if isinstance(part, str):
+        run.append(part)
+        continue
+      if run:
+        merged.append("".join(run))
+        run = []
+      merged.append(part)
+    if run:
+      merged.append("".join(run))
+    return cls(element.name, merged)
+
+  @classmethod
+  def reusable(cls, element):
+    """`element`'s template, to render other trees with, see `matches`"""
+    template = element.__template__()
+    return cls(template.name, template.parts, template.signature(element))
+
+  def signature(self, root):
+    """What each slot holds in `root`, None if it doesn't have them all"""
+    try:
+      return tuple(slot.kind(root) for slot in self.slots)
+    except ValueError:
+      return None
+
+  def matches(self, root):
+    """Whether `root`'s slots hold the same kinds of values as compiled"""
+    return (
+      self.kinds is not None and root.name == self.name
+      and self.signature(root) == self.kinds
+    )
+
+  def render(self, root, rerender=False):
+    resolve_path(root, (), self.name)
+    return "".join([
+      part if part.__class__ is str else part.render(root, rerender)
+      for part in self.parts
+    ])
+
+
 class HTML(Hooks):
   """docstring for Form"""
 
@@ -349,6 +1044,8 @@ class HTML(Hooks):
     self.__indentby = indentby
 
     self.__main = None
+    self.__refs = {}
+    self.__refs_pending = False
 
     self.response = response
 
@@ -380,6 +1077,28 @@ class HTML(Hooks):
   def __compile__(self, rerender=False):
     return self.__main.__compile__(rerender)
 
+  def __ref__(self, query, ref):
+    """
+    Connects `ref` to the element matching `query` once the response is
+    sent. Compiling again only replaces the entry, the send hook is
+    registered a single time.
+    """
+    self.__refs[query] = ref
+
+    if self.response and not self.__refs_pending:
+      self.__refs_pending = True
+      self.response.once("send", self.__connect_refs)
+
+  async def __connect_refs(self):
+    self.__refs_pending = False
+    refs, self.__refs = self.__refs, {}
+
+    browser = await self.response.get_browser()
+    for query, ref in refs.items():
+      element = await browser.document.querySelector(query)
+      if element:
+        ref.__connect__(element)
+
   def __ensure_body__(self):
     if self.__main.name != "html":
       if self.__main.name not in ("head", "body"):
@@ -398,9 +1117,16 @@ class Element:
     self.html = html
 
     self.parent = None
+    # shared with every tree using the same key, see `cacheable`
+    self.__fragment = None
+
+    # compiled templates by indentation depth, dropped on mutation
+    self.__templates = {}
+    # Reactive values read by the last compile
+    self.__reads = set()
 
-    self.children = []
-    self.attributes = {}
+    self.children = Children(self)
+    self.attributes = Attributes(self)
 
   def __repr__(self):
     return f"Element(name={self.name}, attrs={self.attributes})"
@@ -414,6 +1140,20 @@ class Element:
       self.append(child)
     return self
 
+  @property
+  def key(self):
+    return self.attributes.get("key")
+
+  def cacheable(self, key):
+    """
+    Marks this subtree as the same in every tree built with `key`, so
+    its HTML is rendered once and reused by the next trees. Subtrees with
+    slots (Reactive values, callbacks or refs) are rendered every time.
+    """
+    self.__fragment = key
+    self.__invalidate__()
+    return self
+
   @property
   def siblings(self):
     if not self.parent:
@@ -428,8 +1168,8 @@ class Element:
     if child:
       child.remove()
     else:
-      self.parent = None
       self.parent.children.remove(self)
+      self.parent = None
 
   def append(self, *children):
     for child in children:
@@ -440,96 +1180,89 @@ class Element:
         child.parent = self
       self.children.append(child)
 
-  def __compile__(self, rerender=False):
-    end = ""
-    body = " "
-    attrs = " "
-    start_close = ""
-    start = "<" + self.name
-
-    refs = {}
-
-    for attr in self.attributes:
-      name = ATTRIBUTE_NAME_SUBSTITUTES.get(attr, attr).replace("_", "-")
-      value = ATTRIBUTE_VALUE_SUBSTITUTES.get(
-        self.attributes[attr], self.attributes[attr]
-      )
+  def prepend(self, *children):
+    for child in children:
+      if isinstance(child, Element):
+        if child.isConnected:
+          child.remove()
 
-      if attr == "ref" and isinstance(value, Ref):
-        if "id" in self.attributes:
-          refs[f"#{self.attributes.get('id')}"] = value
-        else:
-          ref_id = random.randint(0, 100000)
-          refs[f'[ref="{ref_id}"]'] = value
-
-          value = str(ref_id)
-      elif attr == "style" and isinstance(value, dict):
-        value = ";".join(f"{ikey}: {ivalue}" for ikey, ivalue in value.items())
-
-      if isinstance(value, (str, int, bool)):
-        attrs = attrs + (
-          (f'{name}="{value}" ' if value != True else f"{name} ")
-          if value
-          else ""
-        )
-      elif callable(value):
-        if not self.html.response:
-          continue
-
-        value = build_client_callback(value, self.html.response)
-
-        attrs = attrs + f'{name}="{value}" '
+        child.parent = self
+    self.children[0:0] = children
+
+  def __invalidate__(self):
+    """Drops the compiled templates of this element and its ancestors"""
+    element = self
+    while element is not None:
+      element.__templates.clear()
+      element = element.parent
+
+  def __track__(self, reads):
+    """Subscribes to the Reactive values in `reads`, and only those"""
+    for reactive in reads - self.__reads:
+      reactive.__depend__(self)
+    for reactive in self.__reads - reads:
+      reactive.__undepend__(self)
+    self.__reads = reads
+
+  def __template__(self, depth=0):
+    template = self.__templates.get(depth)
+    if template is None:
+      template = self.__templates[depth] = Template.compile(self, depth)
+    return template
+
+  def __compile__(self, rerender=False, depth=0):
+    return self.__template__(depth).render(self, rerender)
+
+  def __build__(self, parts, path, depth):
+    if self.__fragment is None:
+      return self.__build_element__(parts, path, depth)
+
+    key = (self.__fragment, self.html.__indentby__, depth)
+    fragment = FRAGMENTS.get(key)
+    if fragment is None:
+      own = []
+      self.__build_element__(own, path, depth)
+
+      if not all(isinstance(part, str) for part in own):
+        # slots belong to this tree, they can't be shared
+        return parts.extend(own)
+      fragment = FRAGMENTS.put(key, "".join(own))
+
+    parts.append(fragment)
+
+  def __build_element__(self, parts, path, depth):
+    reads = set()
+    parts.append("<" + self.name)
+
+    for attr, value in self.attributes.items():
+      if isinstance(value, Reactive):
+        reads.add(value)
+
+      if isinstance(value, (Reactive, Ref)) or is_callback(value):
+        parts.append(AttributeSlot(self, path, attr))
       else:
-        attrs = attrs + (
-          (f'{name}="{value}" ' if value != True else f"{name} ")
-          if value
-          else ""
-        )
-
-    if self.html.response and not rerender:
-
-      async def init():
-        browser = await self.html.response.get_browser()
-
-        for query, ref in refs.items():
-          element = await browser.document.querySelector(query)
-          if element:
-            ref.__connect__(element)
-
-      self.html.response.once("send", init)
-
-    attrs = attrs.rstrip()
-
-    self.html.__indent__(self.html.__indent__() + 1)
+        parts.append(render_attribute(self, attr, value))
 
     if self.__single:
-      start_close = "/>"
+      parts.append("/> ")
     else:
-      start_close = ">"
-
-      for child in self.children:
-        body = body + f"\n{self.html.__indentby__ * self.html.__indent__()}"
+      parts.append("> ")
+      indentby = self.html.__indentby__
 
-        if isinstance(child, Reactive):
-          if not rerender:
-
-            @child.on("change")
-            async def _(*args):
-              await self.html.dispatch("update")
-
-          child = child.get()
+      for index, child in enumerate(self.children):
+        parts.append("\n" + indentby * (depth + 1))
 
         if isinstance(child, Element):
-          body = body + child.__compile__(rerender)
+          child.__build__(parts, path + (index,), depth + 1)
+        elif isinstance(child, Reactive):
+          reads.add(child)
+          parts.append(ChildSlot(self, path, index, depth + 1))
         else:
-          body = body + str(child)
-
-      body = body + f"\n{self.html.__indentby__ * (self.html.__indent__() - 1) }"
+          parts.append(str(child))
 
-      end = "</" + self.name + ">"
+      parts.append("\n" + indentby * depth + "</" + self.name + ">")
 
-    self.html.__indent__(self.html.__indent__() - 1)
-    return start + attrs + start_close + body + end
+    self.__track__(reads)
 
   def transpile(self, handler):
     children = []
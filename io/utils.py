@@ -1,8 +1,12 @@
+from threading import Lock
+from collections import OrderedDict
 from inspect import iscoroutinefunction
 
 class Hooks:
 
   def __init__(self):
+    # event -> {callback: None}, an ordered set so registering is
+    # idempotent and removing a callback doesn't scan the list
     self.__events = {}
 
   @property
@@ -12,7 +16,7 @@ class Hooks:
   def on(self, event, callback=None):
 
     def wrapper(callback):
-      self.__events.setdefault(event, []).append(callback)
+      self.__events.setdefault(event, {})[callback] = None
       return callback
 
     return wrapper(callback) if callback else wrapper
@@ -20,26 +24,65 @@ class Hooks:
   def once(self, event, callback):
 
     async def _(*args, **kwargs):
+      self.off(event, _)
       if iscoroutinefunction(callback):
         await callback(*args, **kwargs)
       else:
         callback(*args, **kwargs)
-      self.__events.get(event).remove(_)
 
     return self.on(event, _)
   
   def off(self, event, callback):
     if event in self.__events:
-      events = self.__events.get(event, [])
-      try:
-        events.remove(callback)
-      except ValueError:
-        pass
+      self.__events[event].pop(callback, None)
     return callback
 
   async def dispatch(self, event, *args, **kwargs):
-    for callback in self.__events.get(event, []):
+    # copied, callbacks may add or remove hooks while we iterate
+    for callback in list(self.__events.get(event, ())):
       if iscoroutinefunction(callback):
         await callback(*args, **kwargs)
       else:
         callback(*args, **kwargs)
+
+
+class LRUCache:
+  """
+  A mapping bounded to `size` entries, dropping the least recently used
+  one when full. Safe to share between threads.
+  """
+
+  def __init__(self, size=128):
+    self.size = size
+    self.__items = OrderedDict()
+    self.__lock = Lock()
+
+  def __len__(self):
+    return len(self.__items)
+
+  def __contains__(self, key):
+    return key in self.__items
+
+  def get(self, key, default=None):
+    with self.__lock:
+      try:
+        self.__items.move_to_end(key)
+      except KeyError:
+        return default
+      return self.__items[key]
+
+  def put(self, key, value):
+    with self.__lock:
+      self.__items[key] = value
+      self.__items.move_to_end(key)
+      while len(self.__items) > self.size:
+        self.__items.popitem(last=False)
+    return value
+
+  def pop(self, key, default=None):
+    with self.__lock:
+      return self.__items.pop(key, default)
+
+  def clear(self):
+    with self.__lock:
+      self.__items.clear()